@@ -2,7 +2,6 @@ from flask import Flask
 import os
 from dotenv import load_dotenv
 from flask_cors import CORS
-from flask_pymongo import PyMongo
 
 load_dotenv()
 
@@ -20,18 +19,29 @@ def create_app():
     # Debug mode - only enabled in development
     app.config['DEBUG'] = os.getenv('FLASK_ENV') != 'production'
 
-    # Initialize MongoDB
-    mongo = PyMongo(app)
+    # Initialize MongoDB - one lazily created client per worker process,
+    # shared by every repository
+    from . import deps
+    deps.init_app(app)
+
+    from . import metrics
+    metrics.init_app(app)
+
+    if os.getenv("ENSURE_INDEXES_ON_STARTUP", "false").lower() == "true":
+        from .indexes import ensure_indexes
+        ensure_indexes(deps.db)
 
     # Register blueprints
     from .users_routes import users_bp
     from .tasks_routes import tasks_bp
     from .schedule_routes import schedule_bp
     from .health_routes import health_bp
+    from .jobs_routes import jobs_bp
 
     app.register_blueprint(users_bp)
     app.register_blueprint(tasks_bp)
     app.register_blueprint(schedule_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(jobs_bp)
 
     return app
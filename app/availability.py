@@ -0,0 +1,178 @@
+"""
+Weekly availability profiles.
+
+Stored on the user document as:
+
+    "availability": {
+        "working_hours": {"mon": [["08:00", "12:00"], ["13:00", "18:00"]], ...},
+        "concentration": {"mon": [["09:00", "11:00"]], ...},
+        "blocked": [{"start": "2026-12-24", "end": "2026-12-27"},
+                    {"start": "2026-11-03T14:00:00+01:00", "end": "2026-11-03T16:00:00+01:00"}]
+    }
+
+Weekdays missing from working_hours are days off. Blocked periods are
+either whole local days (dates, end exclusive) or RFC 3339 instants.
+Users without a profile get the legacy 08:00-20:00 day with their
+`concentration_time`, if any.
+
+A profile compiles to minute intervals per (timezone, date), cached with
+lru_cache, so each scheduling run only shifts precomputed intervals.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+
+from .freebusy import Interval, free_intervals, local_midnight, merge_intervals, parse_rfc3339, to_offset
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DEFAULT_WORKDAY = ("08:00", "20:00")
+
+DayWindows = Tuple[Tuple[int, int], ...]
+
+
+def _minutes(value: str) -> int:
+    if value == "24:00":
+        return 1440
+    try:
+        parsed = datetime.strptime(value, "%H:%M")
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.strptime(value, "%H:%M:%S")
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid time '{value}', expected HH:MM")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _format(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _parse_week(doc: Optional[Dict[str, Any]], field: str) -> Tuple[DayWindows, ...]:
+    doc = doc or {}
+    unknown = set(doc) - set(WEEKDAYS)
+    if unknown:
+        raise ValueError(f"Unknown weekday(s) in {field}: {', '.join(sorted(unknown))}")
+
+    week = []
+    for weekday in WEEKDAYS:
+        windows = []
+        for window in doc.get(weekday) or []:
+            if not isinstance(window, (list, tuple)) or len(window) != 2:
+                raise ValueError(f"{field}.{weekday} entries must be [start, end] pairs")
+            start, end = _minutes(window[0]), _minutes(window[1])
+            if end <= start:
+                raise ValueError(f"{field}.{weekday}: {window[0]}-{window[1]} ends before it starts")
+            windows.append((start, end))
+        week.append(tuple(sorted(windows)))
+    return tuple(week)
+
+
+def _parse_blocked(entries: Optional[List[Dict[str, str]]]) -> Tuple[Tuple[str, str], ...]:
+    blocked = []
+    for entry in entries or []:
+        start, end = entry.get("start"), entry.get("end")
+        if not isinstance(start, str) or not isinstance(end, str):
+            raise ValueError("blocked entries need 'start' and 'end'")
+        for value in (start, end):
+            try:
+                date.fromisoformat(value) if len(value) == 10 else parse_rfc3339(value)
+            except ValueError:
+                raise ValueError(f"Invalid blocked time '{value}'")
+        blocked.append((start, end))
+    return tuple(blocked)
+
+
+@dataclass(frozen=True)
+class AvailabilityProfile:
+    """Immutable (hence hashable, hence cacheable) form of a profile."""
+
+    working_hours: Tuple[DayWindows, ...]
+    concentration: Tuple[DayWindows, ...]
+    blocked: Tuple[Tuple[str, str], ...] = ()
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "AvailabilityProfile":
+        """Validate a stored or submitted profile; raises ValueError."""
+        return cls(
+            working_hours=_parse_week(doc.get("working_hours"), "working_hours"),
+            concentration=_parse_week(doc.get("concentration"), "concentration"),
+            blocked=_parse_blocked(doc.get("blocked")),
+        )
+
+    @classmethod
+    def for_user(cls, user: Optional[dict]) -> "AvailabilityProfile":
+        user = user or {}
+        if user.get("availability"):
+            profile = cls.from_document(user["availability"])
+            if any(profile.concentration):
+                return profile
+        else:
+            workday = ((_minutes(DEFAULT_WORKDAY[0]), _minutes(DEFAULT_WORKDAY[1])),)
+            profile = cls(working_hours=(workday,) * 7, concentration=((),) * 7)
+
+        # The legacy single window applies to every day.
+        legacy = user.get("concentration_time") or {}
+        if legacy.get("start") and legacy.get("end"):
+            window = ((_minutes(legacy["start"]), _minutes(legacy["end"])),)
+            profile = cls(profile.working_hours, (window,) * 7, profile.blocked)
+        return profile
+
+    def to_document(self) -> Dict[str, Any]:
+        def week(windows):
+            return {
+                weekday: [[_format(s), _format(e)] for s, e in day]
+                for weekday, day in zip(WEEKDAYS, windows) if day
+            }
+
+        return {
+            "working_hours": week(self.working_hours),
+            "concentration": week(self.concentration),
+            "blocked": [{"start": s, "end": e} for s, e in self.blocked],
+        }
+
+
+def _resolve(value: str, tz) -> datetime:
+    if len(value) == 10:
+        return local_midnight(date.fromisoformat(value), tz)
+    parsed = parse_rfc3339(value)
+    return parsed if parsed.tzinfo else tz.localize(parsed)
+
+
+def _wall_clock(day: date, minutes: int, tz) -> datetime:
+    if minutes >= 1440:
+        return local_midnight(day + timedelta(days=1), tz)
+    return tz.localize(datetime.combine(day, time(minutes // 60, minutes % 60)))
+
+
+def _day_offsets(windows: DayWindows, day: date, tz, midnight: datetime) -> List[Interval]:
+    # Wall-clock times mapped through the timezone, so DST days come out right.
+    return [
+        (to_offset(_wall_clock(day, s, tz), midnight), to_offset(_wall_clock(day, e, tz), midnight))
+        for s, e in windows
+    ]
+
+
+@lru_cache(maxsize=8192)
+def compile_day(profile: AvailabilityProfile, timezone: str, day: date) -> Tuple[Tuple[Interval, ...], Tuple[Interval, ...]]:
+    """
+    (working windows, concentration windows) for one local date, in minutes
+    from that date's local midnight, with blocked periods removed from the
+    working windows.
+    """
+    tz = pytz.timezone(timezone)
+    midnight = local_midnight(day, tz)
+    weekday = day.weekday()
+
+    working = merge_intervals(_day_offsets(profile.working_hours[weekday], day, tz, midnight))
+    if profile.blocked:
+        blocked = [
+            (to_offset(_resolve(start, tz), midnight), to_offset(_resolve(end, tz), midnight))
+            for start, end in profile.blocked
+        ]
+        working = free_intervals(working, blocked)
+
+    concentration = merge_intervals(_day_offsets(profile.concentration[weekday], day, tz, midnight))
+    return tuple(working), tuple(concentration)
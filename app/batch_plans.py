@@ -0,0 +1,178 @@
+"""
+Nightly plan materialization.
+
+Streams every user with a Calendar token, bulk-loads their task documents a
+chunk at a time, runs the Scheduler for many users in parallel in a process
+pool and writes one precomputed plan per user into the `plans` collection.
+
+    python -m app.batch_plans --workers 4 --chunk-size 200 --days 7
+
+Use --workers 0 to plan in-process (handy with mocked clients/collections).
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .models import Task
+from .repositories import top_schedulable
+from .scheduler import Scheduler
+
+USER_PROJECTION = {"_id": 0, "sub": 1, "accessToken": 1, "concentration_time": 1, "availability": 1, "timeZone": 1}
+
+# Set in each worker process by _init_worker.
+_worker_scheduler: Optional[Scheduler] = None
+
+
+@dataclass
+class BatchStats:
+    users: int = 0
+    planned: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.seconds if self.seconds else 0.0
+
+
+def build_plan(scheduler: Scheduler, user: Dict[str, Any], tasks: List[dict], days: int, task_limit: int = 100) -> Dict[str, Any]:
+    access_token = user["accessToken"]
+    user_timezone = user.get("timeZone") or scheduler.calendar_client.get_primary_timezone(access_token)
+
+    docs = top_schedulable(tasks, task_limit)
+    sorted_tasks = [Task.from_mongo(t) for t in docs]
+
+    available_slots = scheduler.find_optimal_slots(
+        access_token, days, user_timezone=user_timezone, user=user
+    )
+    scheduled_tasks = scheduler.schedule_tasks_in_slots(sorted_tasks, available_slots)
+
+    return {
+        "sub": user["sub"],
+        "timeZone": user_timezone,
+        "days": days,
+        "scheduled_tasks": scheduled_tasks,
+        "generatedAt": datetime.now(timezone.utc),
+    }
+
+
+def _init_worker(calendar_client_factory: Callable[[], Any], buffer_minutes: int, engine: str = "slots"):
+    global _worker_scheduler
+    # Workers never touch Mongo: the user document is shipped with the job.
+    _worker_scheduler = Scheduler(calendar_client_factory(), None, buffer_minutes=buffer_minutes, engine=engine)
+
+
+def _plan_worker(job) -> Dict[str, Any]:
+    user, tasks, days, task_limit = job
+    try:
+        return build_plan(_worker_scheduler, user, tasks, days, task_limit)
+    except Exception as e:
+        return {
+            "sub": user["sub"],
+            "error": str(e),
+            "generatedAt": datetime.now(timezone.utc),
+        }
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(
+    users_collection,
+    task_repo,
+    plan_repo,
+    calendar_client_factory: Callable[[], Any],
+    workers: int = 4,
+    chunk_size: int = 200,
+    days: int = 7,
+    buffer_minutes: int = 10,
+    task_limit: int = 100,
+    engine: str = "slots",
+) -> BatchStats:
+    stats = BatchStats()
+    started = time.perf_counter()
+
+    users = users_collection.find(
+        {"accessToken": {"$exists": True}}, USER_PROJECTION, batch_size=chunk_size
+    )
+
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(calendar_client_factory, buffer_minutes, engine),
+        )
+    else:
+        _init_worker(calendar_client_factory, buffer_minutes, engine)
+
+    try:
+        for chunk in _chunks(users, chunk_size):
+            subs = [u["sub"] for u in chunk]
+            tasks_by_sub = task_repo.find_tasks_for_subs(subs)
+            jobs = [(u, tasks_by_sub.get(u["sub"], []), days, task_limit) for u in chunk]
+
+            if executor:
+                plans = list(executor.map(_plan_worker, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+            else:
+                plans = [_plan_worker(job) for job in jobs]
+
+            # A failed run must not replace the user's last good plan.
+            failures = [p for p in plans if "error" in p]
+            plan_repo.save_plans([p for p in plans if "error" not in p])
+            plan_repo.record_failures(failures)
+
+            stats.users += len(plans)
+            stats.failed += len(failures)
+            stats.planned = stats.users - stats.failed
+    finally:
+        if executor:
+            executor.shutdown()
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute schedule plans for all users.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--days", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from . import deps
+
+    stats = run(
+        deps.users_collection,
+        deps.task_repo,
+        deps.plan_repo,
+        # Same timeouts, retries, cache and rate limits as the web app.
+        partial(deps.build_calendar_client, processes=max(1, args.workers)),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        days=args.days or deps.SCHEDULE_HORIZON_DAYS,
+        buffer_minutes=deps.scheduler.buffer_minutes,
+        task_limit=deps.SCHEDULE_TASK_LIMIT,
+        engine=deps.scheduler.engine,
+    )
+
+    print(
+        f"Planned {stats.planned}/{stats.users} users "
+        f"({stats.failed} failed) in {stats.seconds:.2f}s "
+        f"- {stats.users_per_second:.1f} users/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
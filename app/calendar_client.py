@@ -1,32 +1,493 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlencode, urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from . import metrics
+from .rate_limit import is_quota_error
+
+# Google rejects batch requests with more than 50 calls.
+BATCH_LIMIT = 50
+# freeBusy answers for at most 50 calendars per query.
+FREEBUSY_CALENDAR_LIMIT = 50
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+
+class SyncTokenExpired(Exception):
+    """Google answered 410 Gone: the sync token is no longer valid and a full resync is needed."""
+
+
+@dataclass
+class BatchRequest:
+    method: str
+    path: str                      # relative to base_url, e.g. "/calendars/primary/events"
+    params: Optional[dict] = None
+    body: Optional[dict] = None
+
+
+@dataclass
+class BatchResponse:
+    status: int
+    body: Any = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def error(self) -> Optional[str]:
+        if self.ok:
+            return None
+        if isinstance(self.body, dict) and "error" in self.body:
+            err = self.body["error"]
+            return err.get("message", str(err)) if isinstance(err, dict) else str(err)
+        return f"HTTP {self.status}"
+
 
 class GoogleCalendarClient:
 
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        batch_url: Optional[str] = None,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        event_cache=None,
+        rate_limiter=None,
+    ):
         self.base_url = base_url
+        self.batch_url = batch_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Optional EventCache for list_events / free_busy reads.
+        self.event_cache = event_cache
+        # Optional RateLimiter every HTTP attempt goes through.
+        self.rate_limiter = rate_limiter
+
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
     
     def _headers(self, access_token: str) -> dict:
         return {
             "Authorization" : f"Bearer {access_token}",
             "Content-Type" : "application/json"
         }
+
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive pool per process; a session inherited across fork
+        # would share sockets with the parent.
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-operation call counts, errors, retries and latency (ms) since start."""
+        with self._lock:
+            stats = {op: dict(values) for op, values in self._stats.items()}
+        for values in stats.values():
+            values["avg_ms"] = values["total_ms"] / values["count"] if values["count"] else 0.0
+        return stats
+
+    def _record(self, operation: str, elapsed_ms: float, retries: int, error: bool):
+        metrics.record_dependency("calendar", operation, elapsed_ms / 1000, error)
+        if retries:
+            metrics.inc("calendar_retries_total", retries, operation=operation)
+        with self._lock:
+            stats = self._stats.setdefault(
+                operation, {"count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += retries
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+                except ValueError:
+                    pass
+        # Full jitter keeps many workers from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _send(self, method: str, url: str, cost: int, **kwargs) -> requests.Response:
+        if self.rate_limiter is None:
+            return self.session.request(method, url, timeout=self.timeout, **kwargs)
+
+        access_token = _bearer_token(kwargs.get("headers"))
+        with self.rate_limiter.slot(access_token, cost) as slot:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            slot["quota_error"] = _is_quota_response(resp)
+            return resp
+
+    def _request(self, operation: str, method: str, url: str, idempotent: Optional[bool] = None, cost: int = 1, **kwargs) -> requests.Response:
+        """
+        Send one request through the pooled session with timeouts, after the
+        rate limiter (if any) lets it through.
+
+        Retries 429 and 5xx with jittered exponential backoff, honouring
+        Retry-After. Non-idempotent calls (inserts) are only retried on quota
+        errors and when no connection could be established, where Google
+        never saw the request; a connection dropped after sending may already
+        have created the event. Quota errors are 429 and 403
+        rateLimitExceeded / userRateLimitExceeded; other 403s are permission
+        errors and returned.
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+
+        started = time.perf_counter()
+        attempt = 0
+        resp = None
+        error = True
+
+        try:
+            while True:
+                try:
+                    resp = self._send(method, url, cost, **kwargs)
+                except requests.ConnectionError as exc:
+                    if (not idempotent and not _never_connected(exc)) or attempt >= self.max_retries:
+                        raise
+                    time.sleep(self._backoff(attempt, None))
+                    attempt += 1
+                    continue
+                except requests.Timeout:
+                    if not idempotent or attempt >= self.max_retries:
+                        raise
+                    time.sleep(self._backoff(attempt, None))
+                    attempt += 1
+                    continue
+
+                quota_error = _is_quota_response(resp)
+                if quota_error:
+                    metrics.inc("calendar_quota_errors_total", operation=operation)
+                retryable = quota_error or (resp.status_code in RETRY_STATUSES and idempotent)
+                if retryable and attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, resp))
+                    attempt += 1
+                    continue
+
+                error = resp.status_code >= 400
+                return resp
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._record(operation, elapsed_ms, attempt, error)
     
-    def get_primary_timezone(self, access_token: str) -> str:
+    def get_primary_timezone(self, access_token: str, default: Optional[str] = "UTC") -> Optional[str]:
         url = f"{self.base_url}/users/me/calendarList/primary"
-        resp = requests.get(url, headers=self._headers(access_token))
+        resp = self._request("get_primary_timezone", "GET", url, headers=self._headers(access_token))
 
         if resp.status_code == 200:
-            return resp.json().get("timeZone", "UTC")
-        return "UTC"
+            return resp.json().get("timeZone", default)
+        return default
     
     def create_event(self, access_token: str, calendar_id: str, event_details: dict):
-        url = f"{self.base_url}/calendars/{calendar_id}/events"
-        resp = requests.post(url, headers=self._headers(access_token), json=event_details)
+        url = f"{self.base_url}{_events_path(calendar_id)}"
+        try:
+            resp = self._request("create_event", "POST", url, headers=self._headers(access_token), json=event_details)
+        finally:
+            self._invalidate(access_token)
         resp.raise_for_status()
         return resp.json()
 
+    def _invalidate(self, access_token: str):
+        if self.event_cache is not None:
+            self.event_cache.invalidate(access_token)
+
     def list_events(self, access_token: str, calendar_id: str, params: dict):
-        url = f"{self.base_url}/calendars/{calendar_id}/events"
-        resp = requests.post(url, headers=self._headers(access_token), params=params)
+        if self.event_cache is not None:
+            return self.event_cache.get_or_load(
+                access_token, "events", calendar_id, params,
+                lambda: self._list_events(access_token, calendar_id, params),
+            )
+        return self._list_events(access_token, calendar_id, params)
+
+    def _list_events(self, access_token: str, calendar_id: str, params: dict):
+        items, _ = self._list_event_pages(access_token, calendar_id, params)
+        return items
+
+    def list_event_changes(self, access_token: str, calendar_id: str, sync_token: Optional[str] = None, params: Optional[dict] = None):
+        """
+        Incremental sync: with a sync token, only events changed since it was
+        issued (deletions come back with status "cancelled"); without one, a
+        full listing using `params`. Returns (items, next_sync_token) and is
+        never cached. Raises SyncTokenExpired when Google rejects the token.
+        """
+        if sync_token:
+            params = {"syncToken": sync_token, "singleEvents": True, "showDeleted": True}
+        return self._list_event_pages(access_token, calendar_id, params or {})
+
+    def _list_event_pages(self, access_token: str, calendar_id: str, params: dict):
+        url = f"{self.base_url}{_events_path(calendar_id)}"
+        params = _query_params({"maxResults": 2500, **params})
+        items = []
+
+        # Follow nextPageToken so a multi-day window is one logical call.
+        while True:
+            resp = self._request("list_events", "GET", url, headers=self._headers(access_token), params=params)
+            if resp.status_code == 410:
+                raise SyncTokenExpired(calendar_id)
+            resp.raise_for_status()
+            body = resp.json()
+            items.extend(body.get("items", []))
+
+            page_token = body.get("nextPageToken")
+            if not page_token:
+                return items, body.get("nextSyncToken")
+            params = {**params, "pageToken": page_token}
+
+    def list_calendar_ids(self, access_token: str) -> List[str]:
+        """IDs of the calendars the user has selected, primary always included."""
+        url = f"{self.base_url}/users/me/calendarList"
+        params = {"minAccessRole": "freeBusyReader", "maxResults": 250}
+        calendar_ids = []
+
+        while True:
+            resp = self._request("list_calendars", "GET", url, headers=self._headers(access_token), params=params)
+            resp.raise_for_status()
+            body = resp.json()
+            for entry in body.get("items", []):
+                if entry.get("primary") or entry.get("selected"):
+                    calendar_ids.append(entry["id"])
+
+            page_token = body.get("nextPageToken")
+            if not page_token:
+                return calendar_ids
+            params = {**params, "pageToken": page_token}
+
+    def free_busy(self, access_token: str, calendar_ids: List[str], time_min: str, time_max: str, time_zone: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Busy intervals ({"start", "end"} RFC 3339 strings) per calendar ID, from
+        the freeBusy endpoint. Calendars Google reports errors for are left out.
+        """
+        if self.event_cache is not None:
+            return self.event_cache.get_or_load(
+                access_token, "freebusy", ",".join(calendar_ids),
+                {"timeMin": time_min, "timeMax": time_max, "timeZone": time_zone},
+                lambda: self._free_busy(access_token, calendar_ids, time_min, time_max, time_zone),
+            )
+        return self._free_busy(access_token, calendar_ids, time_min, time_max, time_zone)
+
+    def _free_busy(self, access_token: str, calendar_ids: List[str], time_min: str, time_max: str, time_zone: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+        url = f"{self.base_url}/freeBusy"
+        busy: Dict[str, List[Dict[str, str]]] = {}
+
+        for i in range(0, len(calendar_ids), FREEBUSY_CALENDAR_LIMIT):
+            body = {
+                "timeMin": time_min,
+                "timeMax": time_max,
+                "items": [{"id": cid} for cid in calendar_ids[i:i + FREEBUSY_CALENDAR_LIMIT]],
+            }
+            if time_zone:
+                body["timeZone"] = time_zone
+
+            # freeBusy is a read despite being a POST, so it is safe to retry.
+            resp = self._request(
+                "free_busy", "POST", url, idempotent=True, headers=self._headers(access_token), json=body
+            )
+            resp.raise_for_status()
+
+            for calendar_id, result in resp.json().get("calendars", {}).items():
+                if not result.get("errors"):
+                    busy[calendar_id] = result.get("busy", [])
+
+        return busy
+
+    def create_events(self, access_token: str, calendar_id: str, events: List[dict]) -> List[BatchResponse]:
+        try:
+            return self.batch(
+                access_token,
+                [BatchRequest("POST", _events_path(calendar_id), body=e) for e in events],
+            )
+        finally:
+            self._invalidate(access_token)
+
+    def list_events_many(self, access_token: str, calendar_id: str, params_list: List[dict]) -> List[BatchResponse]:
+        """One events.list per params dict, batched. Only the first page of each is returned."""
+        return self.batch(
+            access_token,
+            [BatchRequest("GET", _events_path(calendar_id), params=p) for p in params_list],
+        )
+
+    def batch(self, access_token: str, batch_requests: List[BatchRequest]) -> List[BatchResponse]:
+        """
+        Send calls through the multipart/mixed batch endpoint, BATCH_LIMIT per
+        HTTP request. Responses come back in the same order as the requests;
+        a failed sub-request is reported in its BatchResponse rather than raised.
+        """
+        responses: List[BatchResponse] = []
+        for i in range(0, len(batch_requests), BATCH_LIMIT):
+            responses.extend(self._send_batch_with_retries(access_token, batch_requests[i:i + BATCH_LIMIT]))
+        return responses
+
+    def _send_batch_with_retries(self, access_token: str, batch_requests: List[BatchRequest]) -> List[BatchResponse]:
+        # Google rate-limits each part of a batch separately. Parts rejected
+        # for quota were never acted on, so only those are resent.
+        responses = self._send_batch(access_token, batch_requests)
+        for attempt in range(self.max_retries):
+            throttled = [i for i, r in enumerate(responses) if is_quota_error(r.status, r.body)]
+            if not throttled:
+                break
+            metrics.inc("calendar_quota_errors_total", len(throttled), operation="batch")
+            metrics.inc("calendar_retries_total", len(throttled), operation="batch")
+            if self.rate_limiter is not None:
+                self.rate_limiter.concurrency.decrease()
+            time.sleep(self._backoff(attempt, None))
+            retried = self._send_batch(access_token, [batch_requests[i] for i in throttled])
+            for i, response in zip(throttled, retried):
+                responses[i] = response
+        return responses
+
+    def _batch_endpoint(self) -> str:
+        if self.batch_url:
+            return self.batch_url
+        parts = urlsplit(self.base_url)
+        return f"{parts.scheme}://{parts.netloc}/batch{parts.path}"
+
+    def _send_batch(self, access_token: str, batch_requests: List[BatchRequest]) -> List[BatchResponse]:
+        boundary = f"batch_{uuid.uuid4().hex}"
+        path_prefix = urlsplit(self.base_url).path.rstrip("/")
+        parts = []
+
+        for i, item in enumerate(batch_requests):
+            target = f"{path_prefix}{item.path}"
+            if item.params:
+                target += "?" + urlencode(_query_params(item.params))
+
+            lines = [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <item-{i}>",
+                "",
+                f"{item.method} {target} HTTP/1.1",
+            ]
+            if item.body is not None:
+                lines += ["Content-Type: application/json", "", json.dumps(item.body)]
+            else:
+                lines += [""]
+            parts.append("\r\n".join(lines))
+
+        payload = "\r\n".join(parts) + f"\r\n--{boundary}--\r\n"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": f"multipart/mixed; boundary={boundary}",
+        }
+
+        resp = self._request(
+            "batch",
+            "POST",
+            self._batch_endpoint(),
+            idempotent=all(item.method == "GET" for item in batch_requests),
+            cost=len(batch_requests),
+            headers=headers,
+            data=payload.encode("utf-8"),
+        )
         resp.raise_for_status()
-        return resp.json().get("items", [])
\ No newline at end of file
+
+        by_id = _parse_batch_response(resp.headers.get("Content-Type", ""), resp.text)
+        return [
+            by_id.get(i, BatchResponse(status=0, body={"error": "Missing batch response part"}))
+            for i in range(len(batch_requests))
+        ]
+
+
+def _events_path(calendar_id: str) -> str:
+    # IDs such as "en.usa#holiday@group.v.calendar.google.com" contain
+    # characters ("#", "/") that would otherwise end or split the path.
+    return f"/calendars/{quote(calendar_id, safe='@')}/events"
+
+
+def _never_connected(exc: requests.ConnectionError) -> bool:
+    """Whether the request failed before a connection existed (so nothing was sent)."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError; its reason is the original failure.
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _bearer_token(headers: Optional[dict]) -> Optional[str]:
+    authorization = (headers or {}).get("Authorization", "")
+    return authorization[len("Bearer "):] if authorization.startswith("Bearer ") else None
+
+
+def _is_quota_response(resp: requests.Response) -> bool:
+    if resp.status_code not in (403, 429):
+        return False
+    return is_quota_error(resp.status_code, resp.content)
+
+
+def _query_params(params: dict) -> dict:
+    # requests renders booleans as "True"; the API wants lowercase.
+    return {k: (str(v).lower() if isinstance(v, bool) else v) for k, v in params.items()}
+
+
+def _parse_batch_response(content_type: str, text: str) -> dict:
+    boundary = None
+    for piece in content_type.split(";"):
+        key, _, value = piece.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError("Batch response is missing its multipart boundary")
+
+    results = {}
+    for part in text.split(f"--{boundary}"):
+        part = part.strip("\r\n")
+        if not part or part == "--":
+            continue
+
+        # Outer MIME headers, then the embedded HTTP response.
+        outer, _, http_message = part.replace("\r\n", "\n").partition("\n\n")
+        content_id = None
+        for line in outer.split("\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-id":
+                content_id = value.strip().strip("<>")
+        if content_id is None or "item-" not in content_id:
+            continue
+        index = int(content_id.rsplit("item-", 1)[1])
+
+        head, _, body = http_message.partition("\n\n")
+        status_line = head.split("\n", 1)[0]
+        status = int(status_line.split(" ")[1])
+
+        body = body.strip()
+        try:
+            parsed = json.loads(body) if body else None
+        except ValueError:
+            parsed = body
+        results[index] = BatchResponse(status=status, body=parsed)
+
+    return results
@@ -0,0 +1,157 @@
+"""
+Incremental mirror of users' Google Calendar events in Mongo.
+
+The first sync of a calendar lists the events in a window around now and
+stores Google's nextSyncToken and the end of that window. Later syncs send
+the token and only receive what changed since; deletions arrive as
+"cancelled" events. Events that never change and lie past the listed window
+would never arrive that way, so a caller asking for time beyond the window
+triggers a full listing that reaches further. When Google rejects the token
+(410 Gone) the mirror for that calendar is rebuilt from a full listing.
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytz
+from pymongo import DeleteOne, ReplaceOne
+
+from .calendar_client import GoogleCalendarClient, SyncTokenExpired
+from .freebusy import parse_rfc3339
+
+# All-day events are stored as UTC midnights; widening by the largest UTC
+# offsets keeps them in range queries for every timezone.
+ALL_DAY_MARGIN = timedelta(hours=14)
+
+
+def event_bounds(event: Dict[str, Any]):
+    """(startAt, endAt) as naive UTC datetimes for range queries, or None."""
+    start = event.get("start", {})
+    end = event.get("end", {})
+
+    if start.get("dateTime") and end.get("dateTime"):
+        return (
+            parse_rfc3339(start["dateTime"]).astimezone(pytz.utc).replace(tzinfo=None),
+            parse_rfc3339(end["dateTime"]).astimezone(pytz.utc).replace(tzinfo=None),
+        )
+
+    if start.get("date") and end.get("date"):
+        return (
+            datetime.combine(date.fromisoformat(start["date"]), datetime.min.time()) - ALL_DAY_MARGIN,
+            datetime.combine(date.fromisoformat(end["date"]), datetime.min.time()) + ALL_DAY_MARGIN,
+        )
+
+    return None
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.astimezone(pytz.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+class CalendarSync:
+    def __init__(self, calendar_client: GoogleCalendarClient, events_collection, state_collection, days_back: int = 1, days_ahead: int = 90, min_interval_seconds: float = 60):
+        self.calendar_client = calendar_client
+        self.events_collection = events_collection
+        self.state_collection = state_collection
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+        self.min_interval_seconds = min_interval_seconds
+
+    def sync(self, sub: str, access_token: str, calendar_id: str = "primary", force: bool = False, until: Optional[datetime] = None) -> int:
+        """
+        Bring the mirror of one calendar up to date, covering at least up to
+        `until`, and return the number of changed events applied. Calendars
+        synced less than min_interval_seconds ago are skipped unless `force`
+        is set or they don't reach `until`.
+        """
+        if until is not None and until.tzinfo is None:
+            until = pytz.utc.localize(until)
+        state = self.state_collection.find_one({"sub": sub, "calendarId": calendar_id}) or {}
+        covered = until is None or state.get("windowEnd", 0) >= until.timestamp()
+        if not force and covered and state.get("syncedAt", 0) > time.time() - self.min_interval_seconds:
+            return 0
+
+        items = None
+        window_end = state.get("windowEnd")
+        sync_token = state.get("syncToken") if covered else None
+        if sync_token:
+            try:
+                items, next_token = self.calendar_client.list_event_changes(access_token, calendar_id, sync_token)
+            except SyncTokenExpired:
+                pass
+
+        if items is None:
+            items, next_token, window_end = self._full_listing(access_token, calendar_id, until)
+            self.apply(sub, calendar_id, items)
+            # Drop whatever the full listing no longer contains; done after the
+            # upserts so readers never see an empty mirror.
+            self.events_collection.delete_many({
+                "sub": sub,
+                "calendarId": calendar_id,
+                "eventId": {"$nin": [event.get("id") for event in items]},
+            })
+        else:
+            self.apply(sub, calendar_id, items)
+
+        self.state_collection.update_one(
+            {"sub": sub, "calendarId": calendar_id},
+            {"$set": {"syncToken": next_token, "syncedAt": time.time(), "windowEnd": window_end}},
+            upsert=True,
+        )
+        return len(items)
+
+    def _full_listing(self, access_token: str, calendar_id: str, until: Optional[datetime] = None):
+        """(items, next sync token, end of the listed window as a timestamp)."""
+        now = datetime.now(pytz.utc)
+        time_max = now + timedelta(days=self.days_ahead)
+        if until is not None and until > time_max:
+            time_max = until
+        params = {
+            "timeMin": (now - timedelta(days=self.days_back)).isoformat(),
+            "timeMax": time_max.isoformat(),
+            "singleEvents": True,
+        }
+        items, next_token = self.calendar_client.list_event_changes(access_token, calendar_id, params=params)
+        return items, next_token, time_max.timestamp()
+
+    def apply(self, sub: str, calendar_id: str, events: Iterable[Dict[str, Any]]):
+        """Upsert changed events and delete cancelled ones in one bulk write."""
+        operations = []
+        for event in events:
+            key = {"sub": sub, "calendarId": calendar_id, "eventId": event.get("id")}
+            if not key["eventId"]:
+                continue
+
+            bounds = event_bounds(event)
+            if event.get("status") == "cancelled" or bounds is None:
+                operations.append(DeleteOne(key))
+                continue
+
+            operations.append(ReplaceOne(
+                key,
+                {**key, "startAt": bounds[0], "endAt": bounds[1], "event": event},
+                upsert=True,
+            ))
+
+        if operations:
+            self.events_collection.bulk_write(operations, ordered=False)
+
+    def events_between(self, sub: str, calendar_ids: List[str], start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Mirrored events overlapping [start, end), ordered by start time."""
+        cursor = self.events_collection.find(
+            {
+                "sub": sub,
+                "calendarId": {"$in": calendar_ids},
+                "startAt": {"$lt": _utc(end)},
+                "endAt": {"$gt": _utc(start)},
+            },
+            {"event": 1, "_id": 0},
+        ).sort("startAt", 1)
+        return [doc["event"] for doc in cursor]
+
+    def invalidate(self, sub: str, calendar_id: Optional[str] = None):
+        """Forget the sync token so the next sync rebuilds the mirror."""
+        query = {"sub": sub}
+        if calendar_id:
+            query["calendarId"] = calendar_id
+        self.state_collection.delete_many(query)
@@ -1,26 +1,131 @@
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
 
-from .repositories import UserRepository, TaskRepository
+from .mongo import LazyDatabase, configure as configure_mongo
+from .repositories import UserRepository, TaskRepository, PlanRepository, PlanPreviewRepository
 from .calendar_client import GoogleCalendarClient
+from .calendar_sync import CalendarSync
+from .event_cache import build_event_cache
+from .jobs import build_job_queue
+from .plan_cache import build_plan_cache
+from .rate_limit import AdaptiveConcurrency, build_rate_limiter
 from .scheduler import Scheduler
+from .timezone_cache import TimezoneCache
 
 load_dotenv()
 
-uri = os.getenv("MONGODB_URI")
-client = MongoClient(uri, server_api=ServerApi('1'))
-db = client["timefinder"]
+# Collections resolve against a per-process client created on first use.
+db = LazyDatabase()
 
 GOOGLE_CALENDAR_API_BASE_URL = os.getenv("GOOGLE_CALENDAR_API_BASE_URL")
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "7"))
+SCHEDULE_TASK_LIMIT = int(os.getenv("SCHEDULE_TASK_LIMIT", "100"))
+# gunicorn's worker count; per-process state is only safe with one worker.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
 
-calendar_client = GoogleCalendarClient(GOOGLE_CALENDAR_API_BASE_URL)
+event_cache = build_event_cache(
+    os.getenv("REDIS_URL"),
+    ttl_seconds=float(os.getenv("CALENDAR_CACHE_TTL", "120")),
+    processes=WEB_CONCURRENCY,
+)
 
-users_collection = db.users
-tasks_collection = db.tasks
+
+def build_calendar_rate_limiter(processes: int = 1):
+    """
+    Defaults sit under Google's per-user and per-project Calendar quotas.
+    Without Redis each process has its own buckets, so `processes` that run
+    side by side split the global rate between them.
+    """
+    if os.getenv("CALENDAR_RATE_LIMIT_ENABLED", "true").lower() != "true":
+        return None
+    redis_url = os.getenv("REDIS_URL")
+    global_rate = float(os.getenv("CALENDAR_RATE_LIMIT", "50"))
+    return build_rate_limiter(
+        redis_url,
+        global_rate=global_rate if redis_url else global_rate / processes,
+        global_burst=float(os.getenv("CALENDAR_RATE_BURST", "100")),
+        user_rate=float(os.getenv("CALENDAR_USER_RATE_LIMIT", "10")),
+        user_burst=float(os.getenv("CALENDAR_USER_RATE_BURST", "20")),
+        concurrency=AdaptiveConcurrency(
+            initial=int(os.getenv("CALENDAR_CONCURRENCY", "8")),
+            maximum=int(os.getenv("CALENDAR_MAX_CONCURRENCY", "16")),
+        ),
+        max_wait_seconds=float(os.getenv("CALENDAR_RATE_LIMIT_MAX_WAIT", "30")),
+    )
+
+
+def build_calendar_client(processes: int = 1) -> GoogleCalendarClient:
+    """The Calendar client as configured by the environment (also used by batch workers)."""
+    return GoogleCalendarClient(
+        GOOGLE_CALENDAR_API_BASE_URL,
+        pool_size=int(os.getenv("CALENDAR_POOL_SIZE", "10")),
+        connect_timeout=float(os.getenv("CALENDAR_CONNECT_TIMEOUT", "3.05")),
+        read_timeout=float(os.getenv("CALENDAR_READ_TIMEOUT", "10")),
+        max_retries=int(os.getenv("CALENDAR_MAX_RETRIES", "3")),
+        event_cache=event_cache,
+        rate_limiter=build_calendar_rate_limiter(processes),
+    )
+
+
+calendar_client = build_calendar_client()
+
+users_collection = db["users"]
+tasks_collection = db["tasks"]
+task_items_collection = db["task_items"]
+plans_collection = db["plans"]
+plan_previews_collection = db["plan_previews"]
+calendar_events_collection = db["calendar_events"]
+calendar_sync_state_collection = db["calendar_sync_state"]
+jobs_collection = db["jobs"]
 
 user_repo = UserRepository(users_collection)
-task_repo = TaskRepository(tasks_collection)
+task_repo = TaskRepository(
+    tasks_collection,
+    task_items_collection,
+    layout=os.getenv("TASKS_LAYOUT", "embedded"),
+    dual_write=os.getenv("TASKS_DUAL_WRITE", "false").lower() == "true",
+)
+plan_repo = PlanRepository(plans_collection)
+plan_preview_repo = PlanPreviewRepository(plan_previews_collection)
+
+plan_cache = build_plan_cache(
+    os.getenv("REDIS_URL"),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL", "900")),
+)
+
+timezone_cache = TimezoneCache(
+    calendar_client,
+    user_repo,
+    ttl_seconds=float(os.getenv("TIMEZONE_CACHE_TTL", str(6 * 3600))),
+)
+
+job_queue = build_job_queue(
+    os.getenv("JOB_QUEUE_BACKEND", "inprocess"),
+    os.getenv("REDIS_URL"),
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    collection=jobs_collection,
+)
+
+# Off by default: reads go straight to Calendar until the mirror is enabled.
+calendar_sync = None
+if os.getenv("CALENDAR_SYNC_ENABLED", "false").lower() == "true":
+    calendar_sync = CalendarSync(
+        calendar_client,
+        calendar_events_collection,
+        calendar_sync_state_collection,
+        days_ahead=int(os.getenv("CALENDAR_SYNC_DAYS_AHEAD", "90")),
+        min_interval_seconds=float(os.getenv("CALENDAR_SYNC_MIN_INTERVAL", "60")),
+    )
+
+scheduler = Scheduler(
+    calendar_client,
+    user_repo,
+    horizon_days=SCHEDULE_HORIZON_DAYS,
+    calendar_sync=calendar_sync,
+    engine=os.getenv("SCHEDULER_ENGINE", "slots"),
+)
+
 
-scheduler = Scheduler(calendar_client, user_repo)
\ No newline at end of file
+def init_app(app):
+    """Point the shared Mongo client at the app's configured URI (used on first access)."""
+    configure_mongo(app.config.get("MONGO_URI"))
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+KEY_PREFIX = "tf:cal"
+
+
+class InMemoryCacheBackend:
+    """
+    Process-local TTL store for tests and single-process setups. Pinned keys
+    (generations) only expire; LRU eviction never drops them.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pinned: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            store = self._pinned if key in self._pinned else self._data
+            entry = store.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del store[key]
+                return None
+            if store is self._data:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float, pinned: bool = False):
+        expires_at = time.monotonic() + ttl_seconds
+        with self._lock:
+            if pinned:
+                self._pinned[key] = (value, expires_at)
+                if len(self._pinned) > self.max_entries:
+                    now = time.monotonic()
+                    self._pinned = {k: v for k, v in self._pinned.items() if v[1] > now}
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """
+    Shared store across gunicorn workers and hosts. Redis failures degrade to
+    cache misses rather than failing the request.
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self._errors = (redis.RedisError,)
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._redis.get(key)
+        except self._errors:
+            return None
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl_seconds: float, pinned: bool = False):
+        # Redis's eviction policy is server-side; EventCache copes with a
+        # lost generation key on its own.
+        try:
+            self._redis.set(key, value, px=int(ttl_seconds * 1000))
+        except self._errors:
+            pass
+
+
+class EventCache:
+    """
+    Short-TTL cache for Calendar reads, keyed by user, calendar and query.
+
+    Users are identified by a hash of their access token, which is all the
+    calendar client sees. Each user has a generation that is part of every
+    key; invalidate() replaces it, so all of the user's cached windows go
+    stale at once without scanning keys. Generations are random rather than
+    counters: if one is lost (expired or evicted) a new one is drawn, and
+    entries from before the loss can never match again.
+    """
+
+    def __init__(self, backend, ttl_seconds: float = 120):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def user_key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()[:24]
+
+    def _generation_key(self, user: str) -> str:
+        return f"{KEY_PREFIX}:gen:{user}"
+
+    def _key(self, access_token: str, namespace: str, calendar_id: str, params: Any) -> str:
+        user = self.user_key(access_token)
+        generation = self.backend.get(self._generation_key(user)) or self._new_generation(user)
+        query = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{KEY_PREFIX}:{user}:{generation}:{namespace}:{calendar_id}:{query}"
+
+    def get_or_load(self, access_token: str, namespace: str, calendar_id: str, params: Any, loader: Callable[[], Any]):
+        key = self._key(access_token, namespace, calendar_id, params)
+        cached = self.backend.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+        value = loader()
+        self.backend.set(key, json.dumps(value), self.ttl_seconds)
+        return value
+
+    def _new_generation(self, user: str) -> str:
+        generation = uuid.uuid4().hex[:12]
+        # Outlive every entry written under it.
+        self.backend.set(self._generation_key(user), generation, self.ttl_seconds * 2, pinned=True)
+        return generation
+
+    def invalidate(self, access_token: str):
+        self._new_generation(self.user_key(access_token))
+
+
+def build_event_cache(redis_url: Optional[str], ttl_seconds: float, processes: int = 1) -> Optional[EventCache]:
+    """
+    None (no caching) for several processes without Redis: a write only
+    invalidates its own process's cache, so the others would keep serving
+    busy time from before it and double-book the slots just filled.
+    """
+    if redis_url:
+        return EventCache(RedisCacheBackend(redis_url), ttl_seconds)
+    if processes > 1:
+        return None
+    return EventCache(InMemoryCacheBackend(), ttl_seconds)
@@ -0,0 +1,90 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+DEFAULT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "16"))
+DEFAULT_PER_KEY_LIMIT = int(os.getenv("FANOUT_PER_USER_LIMIT", "4"))
+
+
+@dataclass
+class FanoutResult:
+    value: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class KeyedLimiter:
+    """Caps how many calls for the same key (e.g. a user's sub) run at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores: Dict[Hashable, threading.Semaphore] = {}
+        self._users: Dict[Hashable, int] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(key, threading.BoundedSemaphore(self.limit))
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            with semaphore:
+                yield
+        finally:
+            with self._lock:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._semaphores[key]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+_limiter = KeyedLimiter(DEFAULT_PER_KEY_LIMIT)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    # Threads do not survive fork; build the pool in the process that uses it.
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="fanout"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def run_bounded(fn: Callable[[Any], Any], items: Iterable[Any], key: Hashable = None) -> List[FanoutResult]:
+    """
+    Run fn over items on the shared worker pool and return one FanoutResult per
+    item, in input order. Exceptions are captured per item so one failure does
+    not abort the rest. With a key, at most FANOUT_PER_USER_LIMIT calls for
+    that key run concurrently across all requests in this process.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            if key is None:
+                return FanoutResult(value=fn(item))
+            with _limiter.hold(key):
+                return FanoutResult(value=fn(item))
+        except Exception as e:
+            return FanoutResult(error=str(e))
+
+    if len(items) == 1:
+        return [call(items[0])]
+
+    futures = [_get_executor().submit(call, item) for item in items]
+    return [f.result() for f in futures]
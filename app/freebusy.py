@@ -0,0 +1,99 @@
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Half-open [start, end) interval expressed in whole minutes from an origin
+# datetime (usually local midnight of the first scheduling day).
+Interval = Tuple[int, int]
+
+
+def parse_rfc3339(value: str) -> datetime:
+    # Python 3.10's fromisoformat does not accept a trailing "Z".
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def to_offset(dt: datetime, origin: datetime) -> int:
+    return int((dt - origin).total_seconds() // 60)
+
+
+def local_midnight(day: date, tz) -> datetime:
+    return tz.localize(datetime.combine(day, time.min))
+
+
+def event_interval(event: Dict[str, Any], origin: datetime, tz, buffer_minutes: int = 0) -> Optional[Interval]:
+    """
+    Busy interval for a Calendar event, or None if the event does not block time.
+
+    Timed events get the scheduling buffer appended to their end; all-day
+    events ("date" instead of "dateTime") block their whole local day(s).
+    """
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+    # freeBusy ignores invitations the user declined; so do we.
+    if any(a.get("self") and a.get("responseStatus") == "declined" for a in event.get("attendees", [])):
+        return None
+
+    start = event.get("start", {})
+    end = event.get("end", {})
+
+    if start.get("dateTime") and end.get("dateTime"):
+        start_dt = parse_rfc3339(start["dateTime"])
+        end_dt = parse_rfc3339(end["dateTime"])
+        return to_offset(start_dt, origin), to_offset(end_dt, origin) + buffer_minutes
+
+    if start.get("date") and end.get("date"):
+        start_dt = local_midnight(date.fromisoformat(start["date"]), tz)
+        end_dt = local_midnight(date.fromisoformat(end["date"]), tz)
+        return to_offset(start_dt, origin), to_offset(end_dt, origin)
+
+    return None
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and coalesce overlapping or touching intervals in one pass."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_intervals(windows: Iterable[Interval], busy: Iterable[Interval]) -> List[Interval]:
+    """
+    Sweep the (sorted, non-overlapping) working windows against the merged
+    busy intervals and return what is left, in order.
+    """
+    merged = merge_intervals(busy)
+    free: List[Interval] = []
+    i = 0
+
+    for window_start, window_end in windows:
+        # Busy intervals that end before this window can never matter again.
+        while i < len(merged) and merged[i][1] <= window_start:
+            i += 1
+
+        cursor = window_start
+        j = i
+        while j < len(merged) and merged[j][0] < window_end:
+            busy_start, busy_end = merged[j]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= window_end:
+                break
+            j += 1
+
+        if cursor < window_end:
+            free.append((cursor, window_end))
+
+    return free
+
+
+def offset_to_datetime(offset: int, origin: datetime, tz) -> datetime:
+    return tz.normalize(origin + timedelta(minutes=offset))
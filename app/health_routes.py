@@ -1,4 +1,6 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+
+from . import metrics
 
 health_bp = Blueprint("health", __name__)
 
@@ -6,3 +8,8 @@ health_bp = Blueprint("health", __name__)
 @health_bp.get("/health")
 def health():
     return jsonify({"status": "ok"}), 200
+
+
+@health_bp.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
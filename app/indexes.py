@@ -0,0 +1,122 @@
+"""
+Index bootstrap for the timefinder database.
+
+    python -m app.indexes            # create any missing indexes, then report
+    python -m app.indexes --check    # report only; exit 1 if something is missing
+
+Set ENSURE_INDEXES_ON_STARTUP=true to run the create step from create_app.
+"""
+import argparse
+import sys
+from typing import Dict, List
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # Partial so legacy documents without a sub/email do not collide.
+        IndexModel([("sub", ASCENDING)], name="sub_unique", unique=True,
+                   partialFilterExpression={"sub": {"$type": "string"}}),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True,
+                   partialFilterExpression={"email": {"$type": "string"}}),
+        # Scheduler.get_availability looks users up by token.
+        IndexModel([("accessToken", ASCENDING)], name="access_token", sparse=True),
+    ],
+    "tasks": [
+        IndexModel([("sub", ASCENDING)], name="sub_unique", unique=True),
+        # Multikey index for positional updates on tasks.id.
+        IndexModel([("sub", ASCENDING), ("tasks.id", ASCENDING)], name="sub_task_id"),
+    ],
+    "task_items": [
+        IndexModel([("sub", ASCENDING), ("id", ASCENDING)], name="sub_id_unique", unique=True),
+        # Serves find_schedulable's per-priority queries.
+        IndexModel([("sub", ASCENDING), ("isCompleted", ASCENDING), ("priority", ASCENDING)],
+                   name="sub_completed_priority"),
+    ],
+    "plans": [
+        IndexModel([("sub", ASCENDING)], name="sub_unique", unique=True),
+    ],
+    "plan_previews": [
+        IndexModel([("sub", ASCENDING), ("planId", ASCENDING)], name="sub_plan_unique", unique=True),
+        IndexModel([("expiresAt", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "calendar_events": [
+        IndexModel([("sub", ASCENDING), ("calendarId", ASCENDING), ("eventId", ASCENDING)],
+                   name="sub_calendar_event_unique", unique=True),
+        # Serves CalendarSync.events_between range reads.
+        IndexModel([("sub", ASCENDING), ("calendarId", ASCENDING), ("startAt", ASCENDING)],
+                   name="sub_calendar_start"),
+    ],
+    "jobs": [
+        # In-process job state expires on its own.
+        IndexModel([("expiresAt", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "calendar_sync_state": [
+        IndexModel([("sub", ASCENDING), ("calendarId", ASCENDING)],
+                   name="sub_calendar_unique", unique=True),
+    ],
+}
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every declared index (a no-op for those that already exist)."""
+    created = {}
+    for collection_name, models in INDEXES.items():
+        created[collection_name] = db[collection_name].create_indexes(models)
+    return created
+
+
+def check_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Per collection: declared indexes that are missing, and existing indexes
+    that have never been used since the server started ($indexStats).
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = set(collection.index_information())
+        declared = {model.document["name"] for model in models}
+
+        try:
+            unused = sorted(
+                stat["name"]
+                for stat in collection.aggregate([{"$indexStats": {}}])
+                if stat["accesses"]["ops"] == 0 and stat["name"] != "_id_"
+            )
+        except OperationFailure:
+            # $indexStats needs clusterMonitor on some hosted tiers.
+            unused = []
+
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "unused": unused,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and verify MongoDB indexes.")
+    parser.add_argument("--check", action="store_true", help="only report, do not create")
+    args = parser.parse_args(argv)
+
+    from .deps import db
+
+    if not args.check:
+        for collection_name, names in ensure_indexes(db).items():
+            print(f"{collection_name}: ensured {', '.join(names)}")
+
+    missing_any = False
+    for collection_name, result in check_indexes(db).items():
+        if result["missing"]:
+            missing_any = True
+            print(f"{collection_name}: MISSING {', '.join(result['missing'])}")
+        if result["unused"]:
+            print(f"{collection_name}: unused since server start: {', '.join(result['unused'])}")
+
+    if args.check and missing_any:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
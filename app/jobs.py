@@ -0,0 +1,224 @@
+"""
+Background jobs for long-running scheduling work.
+
+Endpoints enqueue a registered job function and return 202 with a job ID;
+GET /jobs/<id> reports status, progress and the result. Jobs run on an
+in-process thread pool by default, with their state in Mongo so any gunicorn
+worker can answer for them. With JOB_QUEUE_BACKEND=redis (and REDIS_URL)
+they are pushed to Redis and executed by separate workers:
+
+    python -m app.jobs worker
+"""
+import abc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JOB_FUNCTIONS: Dict[str, Callable[..., Any]] = {}
+
+
+def register(name: str):
+    """Register fn(progress, **kwargs) under `name`; progress(stage, done, total)."""
+    def decorator(fn):
+        JOB_FUNCTIONS[name] = fn
+        return fn
+    return decorator
+
+
+class JobError(Exception):
+    """A failure to report on the job (and as an HTTP status when run inline)."""
+
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _JobStore(abc.ABC):
+    ttl_seconds: float
+
+    @abc.abstractmethod
+    def _save(self, job: dict):
+        pass
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        pass
+
+    def _new_job(self, name: str) -> dict:
+        if name not in JOB_FUNCTIONS:
+            raise KeyError(f"Unknown job '{name}'")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "status": QUEUED,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._save(job)
+        return job
+
+    def run(self, job: dict, kwargs: dict):
+        fn = JOB_FUNCTIONS[job["name"]]
+
+        def progress(stage: str, done: int = 0, total: int = 0):
+            job["progress"] = {"stage": stage, "done": done, "total": total}
+            job["updated_at"] = time.time()
+            self._save(job)
+
+        job["status"] = RUNNING
+        progress("started")
+
+        try:
+            job["result"] = fn(progress, **kwargs)
+            job["status"] = SUCCEEDED
+        except JobError as e:
+            job["status"] = FAILED
+            job["error"] = {"message": e.message, "status": e.status}
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["id"], job["name"])
+            job["status"] = FAILED
+            job["error"] = {"message": str(e), "status": 500}
+
+        job["updated_at"] = time.time()
+        self._save(job)
+
+
+class InProcessJobQueue(_JobStore):
+    """
+    Runs jobs on a thread pool inside the web process. State lives in
+    `collection` when given (shared by every worker, expired by a TTL index
+    on expiresAt), otherwise in this process's memory.
+    """
+
+    def __init__(self, max_workers: int = 4, ttl_seconds: float = 3600, collection=None):
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def _save(self, job: dict):
+        if self.collection is not None:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+            doc = json.loads(json.dumps(job, default=str))
+            self.collection.replace_one(
+                {"_id": job["id"]}, {**doc, "_id": job["id"], "expiresAt": expires_at}, upsert=True
+            )
+            return
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        if self.collection is not None:
+            return self.collection.find_one({"_id": job_id}, {"_id": 0, "expiresAt": 0})
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def enqueue(self, name: str, **kwargs) -> str:
+        job = self._new_job(name)
+        self._get_executor().submit(self.run, job, kwargs)
+        return job["id"]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="jobs"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for job_id in [
+                j["id"] for j in self._jobs.values()
+                if j["status"] in (SUCCEEDED, FAILED) and j["updated_at"] < cutoff
+            ]:
+                del self._jobs[job_id]
+
+
+class RedisJobQueue(_JobStore):
+    """Job state and the work queue live in Redis, shared by every web and worker process."""
+
+    def __init__(self, url: str, queue_key: str = "tf:jobs:queue", ttl_seconds: float = 86400):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.queue_key = queue_key
+        self.ttl_seconds = ttl_seconds
+
+    def _job_key(self, job_id: str) -> str:
+        return f"tf:jobs:{job_id}"
+
+    def _save(self, job: dict):
+        self._redis.set(self._job_key(job["id"]), json.dumps(job, default=str), ex=int(self.ttl_seconds))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raw = self._redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    def enqueue(self, name: str, **kwargs) -> str:
+        job = self._new_job(name)
+        self._redis.lpush(self.queue_key, json.dumps({"id": job["id"], "kwargs": kwargs}))
+        return job["id"]
+
+    def work(self, poll_seconds: int = 5):
+        while True:
+            item = self._redis.brpop(self.queue_key, timeout=poll_seconds)
+            if not item:
+                continue
+            message = json.loads(item[1])
+            job = self.get(message["id"])
+            if job is None:
+                continue
+            self.run(job, message["kwargs"])
+
+
+def build_job_queue(backend: str, redis_url: Optional[str], max_workers: int = 4, collection=None):
+    if backend == "redis" and redis_url:
+        return RedisJobQueue(redis_url)
+    return InProcessJobQueue(max_workers=max_workers, collection=collection)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ["worker"]:
+        print("usage: python -m app.jobs worker")
+        sys.exit(2)
+
+    from . import schedule_service  # noqa: F401  registers the job functions
+    from .deps import job_queue
+
+    if not isinstance(job_queue, RedisJobQueue):
+        print("JOB_QUEUE_BACKEND=redis and REDIS_URL are required for a standalone worker")
+        sys.exit(2)
+
+    job_queue.work()
+
+
+if __name__ == "__main__":
+    main()
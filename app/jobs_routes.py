@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+
+from .deps import job_queue
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+@jobs_bp.get("/jobs/<job_id>")
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job), 200
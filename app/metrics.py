@@ -0,0 +1,263 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+
+Records per-route request latency, per-dependency call latency and errors
+(Calendar via GoogleCalendarClient, Mongo via pymongo command monitoring)
+and Scheduler phase timings, all as histograms or counters.
+
+Each process keeps its own registry. With METRICS_DIR set, every process
+also writes a snapshot to METRICS_DIR/<pid>-<start>.json at most once per
+METRICS_FLUSH_SECONDS, and /metrics sums all snapshots, so any gunicorn
+worker can answer for the whole deployment. Snapshots of exited workers
+are kept so counters never go backwards; clear the directory on deploy.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "http_request_duration_seconds": ("histogram", "Flask request latency by route, method and status."),
+    "dependency_call_duration_seconds": ("histogram", "Latency of calls to Google Calendar and MongoDB."),
+    "dependency_call_errors_total": ("counter", "Failed calls to Google Calendar and MongoDB."),
+    "calendar_retries_total": ("counter", "Retried Google Calendar requests."),
+    "calendar_quota_errors_total": ("counter", "Google Calendar requests rejected for quota (429 or 403 rate limit)."),
+    "calendar_throttle_wait_seconds": ("histogram", "Time Google Calendar requests waited in the client rate limiter."),
+    "scheduler_phase_duration_seconds": ("histogram", "Time spent in each Scheduler phase."),
+}
+
+
+def _label_key(labels: Dict[str, str]) -> str:
+    return json.dumps(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, dict]] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._started = time.time()
+        self._last_flush = 0.0
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {}).get(key)
+            if series is None:
+                series = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+                self._histograms[name][key] = series
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += seconds
+            series["count"] += 1
+        self._maybe_flush()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+        self._maybe_flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps({"histograms": self._histograms, "counters": self._counters}))
+
+    def _path(self) -> str:
+        return os.path.join(METRICS_DIR, f"{os.getpid()}-{int(self._started)}.json")
+
+    def flush(self):
+        if not METRICS_DIR:
+            return
+        self._last_flush = time.monotonic()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = self._path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _maybe_flush(self):
+        if METRICS_DIR and time.monotonic() - self._last_flush >= FLUSH_SECONDS:
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def collect(self) -> List[dict]:
+        """This process's snapshot plus every other process's latest one."""
+        own = self.snapshot()
+        if not METRICS_DIR:
+            return [own]
+
+        try:
+            self.flush()
+        except OSError:
+            pass
+        snapshots = [own]
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            if path == self._path():
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+registry = Registry()
+
+
+def _reset_after_fork():
+    global registry
+    # A forked child starts counting from zero under its own snapshot file.
+    registry = Registry()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except OSError:
+        pass
+
+
+def observe(name: str, seconds: float, **labels):
+    if ENABLED:
+        registry.observe(name, seconds, **labels)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def record_dependency(dependency: str, operation: str, seconds: float, error: bool):
+    observe("dependency_call_duration_seconds", seconds, dependency=dependency, operation=operation)
+    if error:
+        inc("dependency_call_errors_total", dependency=dependency, operation=operation)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every Mongo command through pymongo's command monitoring."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_dependency("mongo", event.command_name, event.duration_micros / 1e6, False)
+
+    def failed(self, event):
+        record_dependency("mongo", event.command_name, event.duration_micros / 1e6, True)
+
+
+def mongo_event_listeners() -> list:
+    return [MongoCommandListener()] if ENABLED else []
+
+
+def _merge(snapshots: Iterable[dict]) -> dict:
+    merged = {"histograms": {}, "counters": {}}
+    for snapshot in snapshots:
+        for name, series in snapshot.get("histograms", {}).items():
+            target = merged["histograms"].setdefault(name, {})
+            for key, values in series.items():
+                current = target.setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+                current["buckets"] = [a + b for a, b in zip(current["buckets"], values["buckets"])]
+                current["sum"] += values["sum"]
+                current["count"] += values["count"]
+        for name, series in snapshot.get("counters", {}).items():
+            target = merged["counters"].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+    return merged
+
+
+def _format_labels(pairs, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(pairs) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """All processes' metrics in the Prometheus text exposition format."""
+    merged = _merge(registry.collect())
+    lines = []
+
+    for name in sorted(set(merged["histograms"]) | set(merged["counters"])):
+        kind, help_text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for key, values in sorted(merged["histograms"].get(name, {}).items()):
+            pairs = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(pairs, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(pairs, ('le', '+Inf'))} {values['count']}")
+            lines.append(f"{name}_sum{_format_labels(pairs)} {values['sum']}")
+            lines.append(f"{name}_count{_format_labels(pairs)} {values['count']}")
+
+        for key, value in sorted(merged["counters"].get(name, {}).items()):
+            lines.append(f"{name}{_format_labels(json.loads(key))} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Time every request by its URL rule (not the raw path, to bound cardinality)."""
+    if not ENABLED:
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - started,
+                route=route,
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
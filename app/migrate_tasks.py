@@ -0,0 +1,118 @@
+"""
+Online migration from the embedded `tasks` array to per-task documents.
+
+    python -m app.migrate_tasks --batch-size 100          # copy
+    python -m app.migrate_tasks --drop-embedded           # after the flip
+
+Rollout:
+  1. Deploy with TASKS_DUAL_WRITE=true, still serving TASKS_LAYOUT=embedded.
+     Every task write now also lands in `task_items`.
+  2. Run the copy. Each pass $sets every item to its task's current state in
+     the array, so re-running it is safe and brings existing items up to
+     date. A user whose tasksVersion moves while they are being copied is
+     copied again.
+  3. Switch the app to TASKS_LAYOUT=per_task. Dual writes cover the
+     changes made while workers restart. Don't run the copy after this
+     point: the arrays are no longer updated.
+  4. Run with --drop-embedded to remove the arrays from migrated users.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import List
+
+from pymongo import UpdateOne
+
+from .repositories import LAYOUT_PER_TASK, to_task_item
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {"_id": 0, "sub": 1, "tasks": 1, "tasksVersion": 1}
+MAX_RECOPIES = 3
+
+
+def _copy(items_collection, docs: List[dict]):
+    ops = []
+    for doc in docs:
+        for task in doc.get("tasks") or []:
+            if isinstance(task, dict) and "id" in task:
+                ops.append(UpdateOne(
+                    {"sub": doc["sub"], "id": task["id"]},
+                    {"$set": to_task_item(doc["sub"], task)},
+                    upsert=True,
+                ))
+    if ops:
+        # Ordered so new items keep their array order in _id.
+        items_collection.bulk_write(ops, ordered=True)
+
+
+def _changed_since(tasks_collection, docs: List[dict]) -> List[dict]:
+    """Fresh copies of the users whose tasks were written after `docs` was read."""
+    read_versions = {doc["sub"]: doc.get("tasksVersion", 0) for doc in docs}
+    current = tasks_collection.find({"sub": {"$in": list(read_versions)}}, PROJECTION)
+    return [doc for doc in current if doc.get("tasksVersion", 0) != read_versions.get(doc["sub"])]
+
+
+def migrate(tasks_collection, items_collection, batch_size: int = 100, pause_seconds: float = 0.0) -> int:
+    """Copy every user's embedded tasks in batches of users. Returns users copied."""
+    cursor = tasks_collection.find({"tasks": {"$exists": True}}, PROJECTION, batch_size=batch_size)
+    users = 0
+
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            return users
+
+        _copy(items_collection, batch)
+        # A write between our read and our copy may have been overwritten
+        # with the older value; copy those users again.
+        changed = _changed_since(tasks_collection, batch)
+        for _ in range(MAX_RECOPIES):
+            if not changed:
+                break
+            _copy(items_collection, changed)
+            changed = _changed_since(tasks_collection, changed)
+
+        tasks_collection.update_many(
+            {"sub": {"$in": [doc["sub"] for doc in batch]}},
+            {"$set": {"layout": LAYOUT_PER_TASK, "migratedAt": datetime.now(timezone.utc)}},
+        )
+        users += len(batch)
+        logger.info("Copied tasks for %d users", users)
+
+        if pause_seconds:
+            # Leave headroom for live traffic between batches.
+            time.sleep(pause_seconds)
+
+
+def drop_embedded(tasks_collection) -> int:
+    result = tasks_collection.update_many(
+        {"layout": LAYOUT_PER_TASK, "tasks": {"$exists": True}},
+        {"$unset": {"tasks": ""}},
+    )
+    return result.modified_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move task arrays into per-task documents.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--drop-embedded", action="store_true")
+    args = parser.parse_args(argv)
+    # Shows migrate()'s per-batch progress.
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from .deps import tasks_collection, task_items_collection
+
+    if args.drop_embedded:
+        print(f"dropped embedded arrays for {drop_embedded(tasks_collection)} users")
+        return
+
+    users = migrate(tasks_collection, task_items_collection, args.batch_size, args.pause)
+    print(f"done: {users} users copied")
+
+
+if __name__ == "__main__":
+    main()
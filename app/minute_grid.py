@@ -0,0 +1,91 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class MinuteGrid:
+    """
+    Minute-resolution view of the slot dicts produced by
+    Scheduler.find_optimal_slots, for the "numpy" placement engine.
+
+    The horizon becomes two boolean arrays, one entry per minute since the
+    first slot: free (inside an available slot and not yet used) and
+    concentration. Every feasible start for a duration comes out of one
+    sliding-window sum over the cumulative free count, so a task can start
+    on any minute rather than only at a slot boundary.
+    """
+
+    def __init__(self, slots: List[Dict[str, Any]], start_step: int = 1):
+        self.slots = slots
+        self.offsets: List[int] = []
+
+        if not slots:
+            self.free = np.zeros(0, dtype=bool)
+            self.concentration = np.zeros(0, dtype=bool)
+            self.aligned = np.zeros(0, dtype=bool)
+            self._cumulative = None
+            return
+
+        origin = slots[0]["start"]
+        length = max(self._minutes(s["end"], origin) for s in slots)
+        self.free = np.zeros(length, dtype=bool)
+        self.concentration = np.zeros(length, dtype=bool)
+
+        for slot in slots:
+            start = self._minutes(slot["start"], origin)
+            end = self._minutes(slot["end"], origin)
+            self.offsets.append(start)
+            if slot["available"]:
+                self.free[start:end] = True
+            if slot["concentration_time"]:
+                self.concentration[start:end] = True
+
+        # Starts are limited to wall-clock minutes divisible by start_step.
+        self.aligned = (origin.minute + np.arange(length)) % max(start_step, 1) == 0
+        self._cumulative: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _minutes(dt: datetime, origin: datetime) -> int:
+        return int((dt - origin).total_seconds() // 60)
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+    def feasible_starts(self, minutes: int) -> np.ndarray:
+        """Boolean mask over start minutes: True where `minutes` free minutes follow."""
+        minutes = max(minutes, 1)
+        if minutes > len(self.free):
+            return np.zeros(0, dtype=bool)
+
+        if self._cumulative is None:
+            self._cumulative = np.concatenate(([0], np.cumsum(self.free, dtype=np.int64)))
+        window = self._cumulative[minutes:] - self._cumulative[:-minutes]
+        return window == minutes
+
+    def first_fit(self, minutes: int, concentration_time: Optional[bool] = None) -> Optional[int]:
+        """
+        Earliest start offset with `minutes` of free time whose start minute's
+        concentration flag matches (any when `concentration_time` is None).
+        """
+        starts = self.feasible_starts(minutes)
+        if not starts.size:
+            return None
+
+        starts &= self.aligned[:starts.size]
+        if concentration_time is not None:
+            starts &= self.concentration[:starts.size] == concentration_time
+
+        candidates = np.flatnonzero(starts)
+        return int(candidates[0]) if candidates.size else None
+
+    def mark_used(self, start: int, end: int):
+        self.free[start:end] = False
+        self._cumulative = None
+
+    def to_datetime(self, offset: int) -> datetime:
+        # Anchored on the containing slot so the result keeps its tzinfo.
+        position = bisect_right(self.offsets, offset) - 1
+        slot = self.slots[position]
+        return slot["start"] + timedelta(minutes=offset - self.offsets[position])
@@ -0,0 +1,108 @@
+import os
+import threading
+from typing import Optional
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.server_api import ServerApi
+
+from . import metrics
+
+DATABASE_NAME = "timefinder"
+
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_lock = threading.Lock()
+_settings = {}
+
+
+def configure(uri: Optional[str] = None, **overrides):
+    """
+    Set the connection URI and client options before the first use. Options
+    not given here fall back to the MONGO_* environment variables.
+    """
+    if uri:
+        _settings["uri"] = uri
+    _settings.update(overrides)
+
+
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000")),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred"),
+    }
+    options.update({k: v for k, v in _settings.items() if k != "uri"})
+    return options
+
+
+def get_client() -> MongoClient:
+    """
+    The process's single MongoClient, created on first use.
+
+    A client must not be shared across fork, so a process that finds a client
+    built by its parent (gunicorn pre-fork, multiprocessing) builds its own.
+    connect=False defers all network work to the first operation.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                uri = _settings.get("uri") or os.getenv("MONGODB_URI")
+                _client = MongoClient(
+                    uri,
+                    server_api=ServerApi('1'),
+                    connect=False,
+                    event_listeners=metrics.mongo_event_listeners(),
+                    **_client_options(),
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_db() -> Database:
+    return get_client()[DATABASE_NAME]
+
+
+def _reset_after_fork():
+    global _client, _client_pid
+    # Drop (don't close) the parent's client; its sockets belong to the parent.
+    _client = None
+    _client_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyCollection:
+    """
+    Stand-in for a pymongo Collection that resolves against the current
+    process's client on every access, so module-level repositories stay
+    valid across fork and never connect at import time.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def resolve(self) -> Collection:
+        return get_db()[self.name]
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
+
+
+class LazyDatabase:
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(name)
+
+    def __getattr__(self, attr):
+        return getattr(get_db(), attr)
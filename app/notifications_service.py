@@ -1,13 +1,58 @@
 from datetime import datetime, timedelta
 import pytz
 from .deps import calendar_client  
+from .freebusy import parse_rfc3339
 
 
 def schedule_notification_reminders(access_token: str, user_timezone: str):
+    """
+    Returns (created events, failures). Existing events in the 30-day window
+    are listed once and every candidate is deduplicated against them locally;
+    only the missing reminders are inserted, as one batch.
+    """
     
     tz = pytz.timezone(user_timezone)
     calendar_id = "primary"
+
+    candidates = _reminder_candidates(tz)
+    if not candidates:
+        return [], []
+
+    # A failed listing raises: creating blind would duplicate every reminder.
+    existing = calendar_client.list_events(
+        access_token,
+        calendar_id,
+        {
+            "timeMin": candidates[0][0].isoformat(),
+            "timeMax": candidates[-1][1].isoformat(),
+            "singleEvents": True,
+        },
+    )
+    index = build_event_index(existing)
+
+    pending = [
+        event_details
+        for event_time, event_end_time, event_details in candidates
+        if not event_already_scheduled(index, event_time, event_end_time, event_details["summary"])
+    ]
+    if not pending:
+        return [], []
+
     responses = []
+    failures = []
+    for event_details, result in zip(
+        pending, calendar_client.create_events(access_token, calendar_id, pending)
+    ):
+        if result.ok:
+            responses.append(result.body)
+        else:
+            failures.append({"start": event_details["start"]["dateTime"], "error": result.error})
+
+    return responses, failures
+
+
+def _reminder_candidates(tz):
+    candidates = []
 
     start_date = datetime.now(tz)
     end_date = start_date + timedelta(days=30)
@@ -46,40 +91,23 @@ def schedule_notification_reminders(access_token: str, user_timezone: str):
                         "overrides": [{"method": "popup", "minutes": 15}],
                     },
                 }
-
-                if not event_already_scheduled(
-                    access_token, calendar_id, event_time, event_end_time
-                ):
-                    response = calendar_client.create_event(
-                        access_token, calendar_id, event_details
-                    )
-                    responses.append(response)
+                candidates.append((event_time, event_end_time, event_details))
 
         current_date += timedelta(days=1)
 
-    return responses
-
+    return candidates
 
-def event_already_scheduled(access_token, calendar_id, start_time, end_time) -> bool:
-    time_min = start_time.isoformat()
-    time_max = end_time.isoformat()
-
-    params = {
-        "timeMin": time_min,
-        "timeMax": time_max,
-        "singleEvents": True,
-    }
-
-    try:
-        events = calendar_client.list_events(access_token, calendar_id, params)
-    except Exception:
-        return False
 
+def build_event_index(events) -> set:
+    """(start, end, summary) keys, with times compared as instants rather than strings."""
+    index = set()
     for event in events:
-        if (
-            event.get("start", {}).get("dateTime") == time_min
-            and event.get("end", {}).get("dateTime") == time_max
-        ):
-            return True
+        start = event.get("start", {}).get("dateTime")
+        end = event.get("end", {}).get("dateTime")
+        if start and end:
+            index.add((parse_rfc3339(start), parse_rfc3339(end), event.get("summary")))
+    return index
+
 
-    return False
+def event_already_scheduled(index: set, start_time, end_time, summary) -> bool:
+    return (start_time, end_time, summary) in index
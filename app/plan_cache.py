@@ -0,0 +1,70 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pytz
+
+from .event_cache import InMemoryCacheBackend, RedisCacheBackend
+from .models import Task
+
+KEY_PREFIX = "tf:plan"
+
+
+def plan_fingerprint(
+    busy,
+    tasks: List[Task],
+    availability: Dict[str, Any],
+    timezone: str,
+    days: int,
+    earliest: datetime,
+    settings: Dict[str, Any],
+) -> str:
+    """
+    Hash of everything a plan depends on: busy time, the task set, the
+    availability profile, timezone, horizon, the earliest schedulable start
+    (so plans go stale as the day moves on) and scheduler settings.
+    """
+    payload = {
+        "busy": sorted(
+            (start.astimezone(pytz.utc).isoformat(), end.astimezone(pytz.utc).isoformat())
+            for start, end in busy
+        ),
+        "tasks": [
+            (str(t.id), t.name, t.priority, t.time_minutes, t.concentration) for t in tasks
+        ],
+        "availability": availability,
+        "timezone": timezone,
+        "days": days,
+        "earliest": earliest.astimezone(pytz.utc).isoformat(),
+        "settings": settings,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    LRU/TTL store of previewed plans by (sub, fingerprint). The fingerprint
+    doubles as the plan ID the client confirms with.
+    """
+
+    def __init__(self, backend, ttl_seconds: float = 900):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, sub: str, plan_id: str) -> str:
+        return f"{KEY_PREFIX}:{sub}:{plan_id}"
+
+    def get(self, sub: str, plan_id: str) -> Optional[dict]:
+        cached = self.backend.get(self._key(sub, plan_id))
+        return json.loads(cached) if cached is not None else None
+
+    def put(self, sub: str, plan: dict):
+        self.backend.set(self._key(sub, plan["planId"]), json.dumps(plan, default=str), self.ttl_seconds)
+
+
+def build_plan_cache(redis_url: Optional[str], ttl_seconds: float) -> PlanCache:
+    # Redis lets a confirm land on a different worker than its preview.
+    if redis_url:
+        return PlanCache(RedisCacheBackend(redis_url), ttl_seconds)
+    return PlanCache(InMemoryCacheBackend(max_entries=1000), ttl_seconds)
@@ -0,0 +1,73 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pytz
+
+from .fanout import run_bounded
+from .jobs import JobError
+from .models import Task
+from .scheduler import BusyPeriod, Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SchedulingInputs:
+    tasks: List[Task]
+    timezone: str
+    # None when the busy fetch failed; the Scheduler then fetches it itself.
+    busy: Optional[List[BusyPeriod]]
+
+
+def prefetch_scheduling_inputs(user: dict, scheduler: Scheduler, task_repo, timezone_cache, days: int, task_limit: int) -> SchedulingInputs:
+    """
+    Load the schedulable tasks, the user's timezone and their busy time
+    concurrently, so scheduling waits for the slowest read rather than the
+    sum of all three.
+
+    The timezone is not known while busy time is being fetched, so busy
+    time covers a UTC window padded by a day on each side, which contains
+    the local horizon for any timezone. The Scheduler clips it to the
+    working windows.
+
+    All-day events from the mirror are placed in the user's timezone. Users
+    without a stored timeZone (only until their first lookup persists it)
+    have it resolved first, and only tasks and busy time run concurrently.
+    """
+    # Whole UTC days, so repeated requests hit the same cached freeBusy window.
+    today = datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=1)
+    end = today + timedelta(days=days + 2)
+    if user.get("timeZone"):
+        # The stored value is what timezone_cache serves anyway.
+        busy_tz = pytz.timezone(user["timeZone"])
+        loaders = [lambda: timezone_cache.get(user)]
+    else:
+        timezone = _resolve_timezone(user, timezone_cache)
+        busy_tz = pytz.timezone(timezone)
+        loaders = [lambda: timezone]
+
+    loaders += [
+        lambda: task_repo.find_schedulable(user["sub"], task_limit),
+        lambda: scheduler.fetch_busy(user["accessToken"], start, end, busy_tz, user),
+    ]
+    timezone, tasks, busy = run_bounded(lambda load: load(), loaders, key=user["sub"])
+
+    if not tasks.ok:
+        logger.error("Failed to load tasks for %s: %s", user["sub"], tasks.error)
+        raise JobError("Failed to load tasks", 500)
+
+    return SchedulingInputs(
+        tasks=[Task.from_mongo(t) for t in tasks.value],
+        timezone=timezone.value if timezone.ok and timezone.value else "UTC",
+        busy=busy.value if busy.ok else None,
+    )
+
+
+def _resolve_timezone(user: dict, timezone_cache) -> str:
+    try:
+        return timezone_cache.get(user) or "UTC"
+    except Exception:
+        return "UTC"
@@ -0,0 +1,221 @@
+"""
+Client-side rate limiting for Google Calendar calls.
+
+Every request takes a token from two buckets: one for the access token
+(Google's per-user quota) and a global one (the per-project quota). By
+default the buckets live in this process. With a Redis backend they are
+shared by every gunicorn worker and host through an atomic Lua script.
+
+On top of the buckets, AdaptiveConcurrency caps in-flight requests with
+AIMD. The cap grows by about one per round of successful calls and is
+halved when Google answers with a quota error, so throughput settles
+just under the real quota instead of oscillating through error storms.
+"""
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from . import metrics
+
+QUOTA_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class RateLimitExceeded(Exception):
+    """A call waited longer than max_wait_seconds for its turn."""
+
+
+def is_quota_error(status: int, body) -> bool:
+    """429, or a 403 whose reason is a rate limit (not a permissions problem)."""
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    if isinstance(body, (bytes, str)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return False
+    if not isinstance(body, dict):
+        return False
+    error = body.get("error") or {}
+    if not isinstance(error, dict):
+        return False
+    return any(e.get("reason") in QUOTA_REASONS for e in error.get("errors") or [])
+
+
+class InMemoryBucketBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        """
+        Take `cost` tokens; returns 0, or the seconds to wait before trying
+        again. A call may overdraw the bucket (a 50-call batch against a burst
+        of 20); later calls then wait until the debt is repaid.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+# Uses the server clock, so hosts with skewed clocks still share one bucket.
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - cost
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst + math.max(0, -tokens)) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBucketBackend:
+    """
+    Buckets shared across processes. If Redis is unreachable, calls fall back
+    to this process's own buckets rather than failing.
+    """
+
+    def __init__(self, url: str, prefix: str = "tf:rl"):
+        import redis
+
+        self._errors = (redis.RedisError,)
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._script = self._redis.register_script(TAKE_SCRIPT)
+        self._fallback = InMemoryBucketBackend()
+        self.prefix = prefix
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        try:
+            return float(self._script(keys=[f"{self.prefix}:{key}"], args=[rate, burst, cost]))
+        except self._errors:
+            return self._fallback.take(key, rate, burst, cost)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64, cooldown_seconds: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, quota_error: bool):
+        with self._condition:
+            self.in_flight -= 1
+            if quota_error:
+                self._decrease()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def decrease(self):
+        """Back off for a quota error seen outside a slot (a batch sub-response)."""
+        with self._condition:
+            self._decrease()
+
+    def _decrease(self):
+        # One cut per cooldown: a burst of 429s from a single overload
+        # should not collapse the limit to the floor.
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown_seconds:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        backend=None,
+        global_rate: float = 50.0,
+        global_burst: float = 100.0,
+        user_rate: float = 10.0,
+        user_burst: float = 20.0,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_wait_seconds: float = 30.0,
+    ):
+        self.backend = backend or InMemoryBucketBackend()
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_wait_seconds = max_wait_seconds
+
+    @staticmethod
+    def _user_key(access_token: str) -> str:
+        return "user:" + hashlib.sha256(access_token.encode()).hexdigest()[:24]
+
+    def _take(self, key: str, rate: float, burst: float, cost: float, deadline: float):
+        while True:
+            wait = self.backend.take(key, rate, burst, cost)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"Calendar rate limit: waited too long for '{key.split(':')[0]}' quota")
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self, access_token: Optional[str], cost: float = 1):
+        """
+        Wait for both buckets and a concurrency slot, then run the call. Set
+        `quota_error` on the yielded state when Google rejected it for quota.
+        `cost` is the number of API calls the request counts as (a batch
+        counts each of its parts).
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        if access_token:
+            self._take(self._user_key(access_token), self.user_rate, self.user_burst, cost, deadline)
+        self._take("global", self.global_rate, self.global_burst, cost, deadline)
+
+        if not self.concurrency.acquire(max(0.0, deadline - time.monotonic())):
+            raise RateLimitExceeded("Calendar rate limit: no free concurrency slot")
+        metrics.observe("calendar_throttle_wait_seconds", time.monotonic() - started)
+
+        state = {"quota_error": False}
+        try:
+            yield state
+        finally:
+            self.concurrency.release(state["quota_error"])
+
+
+def build_rate_limiter(redis_url: Optional[str], **options) -> RateLimiter:
+    # Redis makes the quota a single budget for every worker and host.
+    if redis_url:
+        return RateLimiter(RedisBucketBackend(redis_url), **options)
+    return RateLimiter(InMemoryBucketBackend(), **options)
@@ -1,5 +1,67 @@
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Any
+from bson import ObjectId
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
 from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+from .models import PRIORITY_MAP
+
+# Fields Task.from_mongo reads; nothing else is shipped for scheduling.
+TASK_FIELDS = ("id", "name", "priority", "time", "concentration", "isCompleted", "isScheduled")
+
+
+LAYOUT_EMBEDDED = "embedded"
+LAYOUT_PER_TASK = "per_task"
+
+
+# Every write to a user's tasks increments this; /get-tasks derives its ETag from it.
+BUMP_VERSION = {"$inc": {"tasksVersion": 1}}
+
+
+def encode_cursor(kind: str, value) -> str:
+    raw = json.dumps({kind: value}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], kind: str):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))[kind]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def to_task_item(sub: str, task: dict) -> dict:
+    """Per-task document, with the fields the (sub, isCompleted, priority) index relies on filled in."""
+    item = {k: v for k, v in task.items() if k != "_id"}
+    item["sub"] = sub
+    item["priority"] = item.get("priority") or "medium"
+    item["isCompleted"] = bool(item.get("isCompleted", False))
+    item["isScheduled"] = bool(item.get("isScheduled", False))
+    return item
+
+
+def is_schedulable(task: dict) -> bool:
+    return not task.get("isCompleted") and not task.get("isScheduled")
+
+
+def top_schedulable(tasks: List[dict], limit: int) -> List[dict]:
+    """
+    Highest-priority incomplete, unscheduled tasks, keeping stored order
+    within a priority, via a bounded heap rather than a full sort.
+    """
+    candidates = (
+        (PRIORITY_MAP.get(task.get("priority", "medium"), 0), -position, task)
+        for position, task in enumerate(tasks)
+        if isinstance(task, dict) and is_schedulable(task)
+    )
+    return [task for _, _, task in heapq.nlargest(limit, candidates, key=lambda c: c[:2])]
 
 class UserRepository:
     
@@ -31,42 +93,411 @@ class UserRepository:
             {"sub": sub},
             {"$set": {"concentration_time": {"start": start, "end": end}}}
         )
+
+    def get_availability(self, sub: str) -> Optional[dict]:
+        return self.collection.find_one({"sub": sub}, {"availability": 1, "concentration_time": 1})
+
+    def upsert_availability(self, sub: str, availability: dict):
+        return self.collection.update_one(
+            {"sub": sub},
+            {"$set": {"availability": availability}}
+        )
+
+    def set_timezone(self, sub: str, timezone: str):
+        return self.collection.update_one(
+            {"sub": sub},
+            {"$set": {"timeZone": timezone}}
+        )
     
 class TaskRepository:
-        def __init__(self, collection: Collection):
+        """
+        Two storage layouts behind one API:
+
+        - "embedded": one document per user in `collection` holding a `tasks` array.
+        - "per_task": one document per task in `items_collection`, indexed on
+          (sub, isCompleted, priority). The per-user document in `collection`
+          stays as a small metadata record.
+
+        With `dual_write` (embedded layout only) every write is repeated on
+        `items_collection`, so per-task documents stay current while the
+        migration to per_task is rolled out (see app.migrate_tasks).
+        """
+        def __init__(self, collection: Collection, items_collection: Optional[Collection] = None, layout: str = LAYOUT_EMBEDDED, dual_write: bool = False):
+            if layout not in (LAYOUT_EMBEDDED, LAYOUT_PER_TASK):
+                raise ValueError(f"Unknown tasks layout '{layout}'")
+            if (layout == LAYOUT_PER_TASK or dual_write) and items_collection is None:
+                raise ValueError("The per_task layout and dual writes need an items collection")
+
             self.collection = collection
+            self.items_collection = items_collection
+            self.layout = layout
+            self.dual_write = dual_write and layout == LAYOUT_EMBEDDED
+
+        @property
+        def per_task(self) -> bool:
+            return self.layout == LAYOUT_PER_TASK
         
         def upsert_task_cluster(self, sub: str, tasks: List):
-            return self.collection.update_one(
+            if self.per_task:
+                self._insert_items(sub, tasks)
+                return self._touch_meta(sub)
+
+            result = self.collection.update_one(
                 {"sub": sub},
-                {"$addToSet": {"tasks": {"$each" : tasks}}},
+                {"$addToSet": {"tasks": {"$each" : tasks}}, **BUMP_VERSION},
                 upsert=True
             )
+            if self.dual_write:
+                self._insert_items(sub, tasks)
+            return result
         
         def add_single_task(self, sub: str, tasks: dict):
-            return self.collection.update_one(
+            if self.per_task:
+                self._insert_items(sub, [tasks])
+                return self._touch_meta(sub)
+
+            result = self.collection.update_one(
                 {"sub": sub},
-                {"$addToSet": {"tasks": tasks}},
+                {"$addToSet": {"tasks": tasks}, **BUMP_VERSION},
                 upsert=True
             )
+            if self.dual_write:
+                self._insert_items(sub, [tasks])
+            return result
         
         def find_by_sub(self, sub: str) -> Optional[dict]:
+            if self.per_task:
+                meta = self.collection.find_one({"sub": sub}, {"tasks": 0})
+                if not meta:
+                    return None
+                items = self.items_collection.find({"sub": sub}, {"_id": 0, "sub": 0}).sort("_id", ASCENDING)
+                return {**meta, "tasks": list(items)}
+
             return self.collection.find_one({"sub": sub})
         
-        def update_task_completion(self, task_id: any, is_completed: bool):
-            return self.collection.update_one(
-                {"tasks.id": task_id},
+        def find_schedulable(self, sub: str, limit: int) -> List[dict]:
+            """
+            Top `limit` incomplete, unscheduled tasks by priority, projected to
+            TASK_FIELDS. Filtering, ranking and the limit all run in Mongo; if
+            the stored document can't go through the pipeline (e.g. `tasks` is
+            not an array) we fall back to ranking in Python.
+            """
+            if self.per_task:
+                return self._find_schedulable_items(sub, limit)
+
+            rank = {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": [{"$ifNull": ["$tasks.priority", "medium"]}, name]}, "then": value}
+                        for name, value in PRIORITY_MAP.items()
+                    ],
+                    "default": 0,
+                }
+            }
+            pipeline = [
+                {"$match": {"sub": sub}},
+                {"$project": {
+                    "_id": 0,
+                    "tasks": {"$filter": {
+                        "input": "$tasks",
+                        "as": "t",
+                        "cond": {"$and": [
+                            {"$ne": ["$$t.isCompleted", True]},
+                            {"$ne": ["$$t.isScheduled", True]},
+                        ]},
+                    }},
+                }},
+                {"$unwind": {"path": "$tasks", "includeArrayIndex": "position"}},
+                {"$project": {
+                    **{field: f"$tasks.{field}" for field in TASK_FIELDS},
+                    "rank": rank,
+                    "position": 1,
+                }},
+                {"$sort": {"rank": -1, "position": 1}},
+                {"$limit": limit},
+                {"$project": {"rank": 0, "position": 0}},
+            ]
+
+            try:
+                return list(self.collection.aggregate(pipeline))
+            except OperationFailure:
+                projection = {"_id": 0, **{f"tasks.{field}": 1 for field in TASK_FIELDS}}
+                doc = self.collection.find_one({"sub": sub}, projection) or {}
+                tasks = doc.get("tasks")
+                return top_schedulable(tasks if isinstance(tasks, list) else [], limit)
+        
+        def find_tasks_for_subs(self, subs: List[str]) -> dict:
+            """sub -> list of task dicts (TASK_FIELDS only), for bulk loading many users."""
+            if self.per_task:
+                grouped = {}
+                projection = {"_id": 0, "sub": 1, **{field: 1 for field in TASK_FIELDS}}
+                cursor = self.items_collection.find({"sub": {"$in": subs}}, projection).sort("_id", ASCENDING)
+                for item in cursor:
+                    grouped.setdefault(item.pop("sub"), []).append(item)
+                return grouped
+
+            projection = {"_id": 0, "sub": 1, **{f"tasks.{field}": 1 for field in TASK_FIELDS}}
+            return {
+                doc["sub"]: doc.get("tasks", [])
+                for doc in self.collection.find({"sub": {"$in": subs}}, projection)
+            }
+        
+        def find_open_task_ids(self, sub: str, task_ids: List[Any]) -> set:
+            """The given task IDs (as strings) that still exist and are neither completed nor scheduled."""
+            if not task_ids:
+                return set()
+
+            if self.per_task:
+                cursor = self.items_collection.find(
+                    {"sub": sub, "id": {"$in": task_ids}, "isCompleted": {"$ne": True}, "isScheduled": {"$ne": True}},
+                    {"_id": 0, "id": 1},
+                )
+                return {str(item["id"]) for item in cursor}
+
+            projection = {"_id": 0, "tasks.id": 1, "tasks.isCompleted": 1, "tasks.isScheduled": 1}
+            doc = self.collection.find_one({"sub": sub}, projection) or {}
+            tasks = doc.get("tasks")
+            wanted = {str(task_id) for task_id in task_ids}
+            return {
+                str(task.get("id")) for task in (tasks if isinstance(tasks, list) else [])
+                if isinstance(task, dict) and str(task.get("id")) in wanted and is_schedulable(task)
+            }
+
+        def update_task_completion(self, sub: str, task_id: Any, is_completed: bool):
+            if self.per_task:
+                result = self.items_collection.update_one(
+                    {"sub": sub, "id": task_id},
+                    {"$set": {"isCompleted": is_completed}}
+                )
+                if result.modified_count:
+                    self._bump_version(sub)
+                return result
+
+            # Bumped separately so a no-op update leaves the version (and
+            # /get-tasks ETags) alone, as in the per_task layout.
+            result = self.collection.update_one(
+                {"sub": sub, "tasks.id": task_id},
                 {"$set": {"tasks.$.isCompleted": is_completed}}
             )
+            if result.modified_count:
+                self._bump_version(sub)
+            if self.dual_write:
+                self.items_collection.update_one(
+                    {"sub": sub, "id": task_id},
+                    {"$set": {"isCompleted": is_completed}}
+                )
+            return result
         
         def mark_task_scheduled(self, sub: str, task_id: Any, start_time, end_time):
+            return self.mark_tasks_scheduled(sub, [(task_id, start_time, end_time)])
+
+        def mark_tasks_scheduled(self, sub: str, entries: List[tuple]):
+            """Mark many (task_id, start_time, end_time) entries in one bulk_write."""
+            if not entries:
+                return None
+
+            item_ops = [
+                UpdateOne(
+                    {"sub": sub, "id": task_id},
+                    {"$set": {"isScheduled": True, "start_time": start_time, "end_time": end_time}},
+                )
+                for task_id, start_time, end_time in entries
+            ]
+            if self.per_task:
+                result = self.items_collection.bulk_write(item_ops, ordered=False)
+                self._bump_version(sub)
+                return result
+
+            ops = [
+                UpdateOne(
+                    {"sub": sub, "tasks.id": task_id},
+                    {
+                        "$set": {
+                            "tasks.$.isScheduled": True,
+                            "tasks.$.start_time": start_time,
+                            "tasks.$.end_time": end_time,
+                        },
+                        **BUMP_VERSION,
+                    },
+                )
+                for task_id, start_time, end_time in entries
+            ]
+            result = self.collection.bulk_write(ops, ordered=False)
+            if self.dual_write:
+                self.items_collection.bulk_write(item_ops, ordered=False)
+            return result
+
+        def get_version(self, sub: str) -> Optional[int]:
+            """The user's tasks version counter, or None if they have no tasks document."""
+            doc = self.collection.find_one({"sub": sub}, {"_id": 0, "tasksVersion": 1})
+            if doc is None:
+                return None
+            return doc.get("tasksVersion", 0)
+
+        def find_page(self, sub: str, limit: int, after: Optional[str] = None, fields: Optional[List[str]] = None,
+                      completed: Optional[bool] = None, scheduled: Optional[bool] = None):
+            """
+            One page of the user's tasks in stored order, as (tasks, next_cursor).
+            Cursors are opaque strings; next_cursor is None on the last page.
+            Raises ValueError for a cursor this layout didn't issue.
+            """
+            position = decode_cursor(after, "o" if self.per_task else "p")
+            if self.per_task:
+                return self._find_page_items(sub, limit, position, fields, completed, scheduled)
+
+            conditions = []
+            if completed is not None:
+                conditions.append({"$eq": [{"$ifNull": ["$$t.isCompleted", False]}, completed]})
+            if scheduled is not None:
+                conditions.append({"$eq": [{"$ifNull": ["$$t.isScheduled", False]}, scheduled]})
+
+            pipeline = [
+                {"$match": {"sub": sub}},
+                {"$project": {"_id": 0, "tasks": 1}},
+                {"$unwind": {"path": "$tasks", "includeArrayIndex": "position"}},
+            ]
+            if position is not None:
+                pipeline.append({"$match": {"position": {"$gt": position}}})
+            if conditions:
+                # $unwind leaves a plain document, so the filters read "$tasks.*".
+                pipeline.append({"$match": {"$expr": {"$and": [
+                    {"$let": {"vars": {"t": "$tasks"}, "in": condition}} for condition in conditions
+                ]}}})
+            pipeline.append({"$limit": limit + 1})
+            if fields:
+                pipeline.append({"$project": {
+                    "position": 1, **{f"tasks.{field}": 1 for field in fields}
+                }})
+
+            rows = list(self.collection.aggregate(pipeline))
+            next_cursor = encode_cursor("p", rows[limit - 1]["position"]) if len(rows) > limit else None
+            return [row["tasks"] for row in rows[:limit]], next_cursor
+
+        def _find_page_items(self, sub, limit, position, fields, completed, scheduled):
+            query = {"sub": sub}
+            if position is not None:
+                if not ObjectId.is_valid(position):
+                    raise ValueError("Invalid cursor")
+                query["_id"] = {"$gt": ObjectId(position)}
+            if completed is not None:
+                query["isCompleted"] = completed
+            if scheduled is not None:
+                query["isScheduled"] = scheduled
+
+            projection = {"sub": 0}
+            if fields:
+                projection = {field: 1 for field in fields}
+
+            items = list(
+                self.items_collection.find(query, projection).sort("_id", ASCENDING).limit(limit + 1)
+            )
+            next_cursor = encode_cursor("o", str(items[limit - 1]["_id"])) if len(items) > limit else None
+            for item in items:
+                item.pop("_id", None)
+            return items[:limit], next_cursor
+
+        def _bump_version(self, sub: str):
+            return self.collection.update_one({"sub": sub}, BUMP_VERSION, upsert=True)
+
+        def _touch_meta(self, sub: str):
             return self.collection.update_one(
-            {"sub": sub, "tasks.id": task_id},
-            {
-                "$set": {
-                    "tasks.$.isScheduled": True,
-                    "tasks.$.start_time": start_time,
-                    "tasks.$.end_time": end_time,
-                }
-            }
-        )
\ No newline at end of file
+                {"sub": sub},
+                {"$set": {"layout": LAYOUT_PER_TASK}, **BUMP_VERSION},
+                upsert=True
+            )
+
+        def _insert_items(self, sub: str, tasks: List[dict]):
+            # Mirrors $addToSet: an existing (sub, id) is left untouched.
+            ops = [
+                UpdateOne(
+                    {"sub": sub, "id": task.get("id")},
+                    {"$setOnInsert": to_task_item(sub, task)},
+                    upsert=True,
+                )
+                for task in tasks
+            ]
+            if ops:
+                self.items_collection.bulk_write(ops, ordered=True)
+
+        def _find_schedulable_items(self, sub: str, limit: int) -> List[dict]:
+            # One index-backed query per priority level, highest first, instead
+            # of sorting on a string field that doesn't order by rank.
+            projection = {"_id": 0, **{field: 1 for field in TASK_FIELDS}}
+            levels = sorted(PRIORITY_MAP, key=PRIORITY_MAP.get, reverse=True)
+            found: List[dict] = []
+
+            for priority in levels + [None]:
+                remaining = limit - len(found)
+                if remaining <= 0:
+                    break
+                query = {"sub": sub, "isCompleted": False, "isScheduled": {"$ne": True}}
+                query["priority"] = priority if priority else {"$nin": levels}
+                cursor = self.items_collection.find(query, projection).sort("_id", ASCENDING).limit(remaining)
+                found.extend(cursor)
+
+            return found
+
+
+
+class PlanRepository:
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    def find_by_sub(self, sub: str) -> Optional[dict]:
+        return self.collection.find_one({"sub": sub}, {"_id": 0})
+
+    def save_plans(self, plans: List[dict]):
+        if not plans:
+            return None
+        return self.collection.bulk_write(
+            [ReplaceOne({"sub": plan["sub"]}, plan, upsert=True) for plan in plans],
+            ordered=False,
+        )
+
+    def record_failures(self, failures: List[dict]):
+        """
+        Note failed planning runs on the user's existing plan, which stays
+        in place. Users without a plan get no document.
+        """
+        if not failures:
+            return None
+        return self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"sub": f["sub"]},
+                    {"$set": {"lastError": f["error"], "lastErrorAt": f["generatedAt"]}},
+                )
+                for f in failures
+            ],
+            ordered=False,
+        )
+
+
+class PlanPreviewRepository:
+    """
+    Previewed plans awaiting confirmation, by (sub, planId). Kept apart from
+    the nightly `plans` so a preview never replaces them, and expired by a
+    TTL index on expiresAt.
+    """
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    def save(self, plan: dict, ttl_seconds: float):
+        generated_at = plan["generatedAt"]
+        return self.collection.replace_one(
+            {"sub": plan["sub"], "planId": plan["planId"]},
+            {**plan, "expiresAt": generated_at + timedelta(seconds=ttl_seconds)},
+            upsert=True,
+        )
+
+    def find(self, sub: str, plan_id: str) -> Optional[dict]:
+        """The preview, unless it is past its expiry (the TTL monitor runs only once a minute)."""
+        plan = self.collection.find_one({"sub": sub, "planId": plan_id}, {"_id": 0})
+        if not plan:
+            return None
+        expires_at = plan.pop("expiresAt")
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return None
+        return plan
@@ -2,98 +2,99 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 import pytz
 
-from .deps import user_repo, task_repo, scheduler, calendar_client
-from .models import Task
+from .deps import user_repo, plan_repo, calendar_client, calendar_sync, timezone_cache, job_queue
+from .jobs import JOB_FUNCTIONS, JobError
 from .utils import parse_time
-from .notifications_service import schedule_notification_reminders
+from . import schedule_service  # registers the scheduling jobs
 
 
 schedule_bp = Blueprint("schedule", __name__)
 
+MAX_HORIZON_DAYS = 31
+
+
+def _run_or_enqueue(job_name: str, data: dict, **kwargs):
+    """
+    Queue the job and answer 202 with its ID, or run it inline when the
+    caller sends "sync": true.
+    """
+    if data.get("sync"):
+        try:
+            return jsonify(JOB_FUNCTIONS[job_name](**kwargs)), 200
+        except JobError as e:
+            return jsonify({"error": e.message}), e.status
+
+    job_id = job_queue.enqueue(job_name, **kwargs)
+    return (
+        jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}),
+        202,
+        {"Location": f"/jobs/{job_id}"},
+    )
+
 
 @schedule_bp.post("/schedule_tasks")
 def schedule_tasks_route():
     data = request.get_json()
     sub = data.get("sub")
+    if not sub:
+        return jsonify({"error": "Missing 'sub' in request"}), 400
 
-    user = user_repo.find_by_sub(sub)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    days = data.get("days")
+    if days is not None and (not isinstance(days, int) or not 1 <= days <= MAX_HORIZON_DAYS):
+        return jsonify({"error": f"'days' must be between 1 and {MAX_HORIZON_DAYS}"}), 400
 
-    tasks_data = task_repo.find_by_sub(sub)
-    if not tasks_data or "tasks" not in tasks_data:
-        return jsonify({"error": "No incomplete tasks found"}), 404
+    return _run_or_enqueue("schedule_tasks", data, sub=sub, days=days)
 
-    access_token = user.get("accessToken")
-    if not access_token:
-        return jsonify({"error": "Missing access token"}), 400
 
-    user_timezone = calendar_client.get_primary_timezone(access_token)
-    tz = pytz.timezone(user_timezone)
+@schedule_bp.post("/schedule_preview")
+def schedule_preview_route():
+    data = request.get_json()
+    sub = data.get("sub")
+    if not sub:
+        return jsonify({"error": "Missing 'sub' in request"}), 400
 
-    incomplete_docs = [t for t in tasks_data["tasks"] if not t.get("isCompleted")]
-    incomplete_tasks = [Task.from_mongo(t) for t in incomplete_docs]
-
-    sorted_tasks = scheduler.sort_tasks(incomplete_tasks)
-    top_tasks = sorted_tasks[:5]
-    available_slots = scheduler.find_optimal_slots(access_token)
-    scheduled_tasks = scheduler.schedule_tasks_in_slots(top_tasks, available_slots)
-
-    calendar_id = "primary"
-    event_responses = []
-
-    for task in scheduled_tasks:
-        start_date_str, start_time_str = task["start_time"].split(" ")
-        end_date_str, end_time_str = task["end_time"].split(" ")
-
-        start_time = parse_time(
-            start_time_str,
-            datetime.strptime(start_date_str, "%Y-%m-%d"),
-            tz,
-        )
-        end_time = parse_time(
-            end_time_str,
-            datetime.strptime(end_date_str, "%Y-%m-%d"),
-            tz,
-        )
-
-        event_details = {
-            "summary": f"{task['task']} 💙 TimeFinder",
-            "start": {"dateTime": start_time.isoformat(), "timeZone": user_timezone},
-            "end": {"dateTime": end_time.isoformat(), "timeZone": user_timezone},
-            "colorId": "5",
-        }
-
-        response = calendar_client.create_event(access_token, calendar_id, event_details)
-        event_responses.append(response)
-
-        task_repo.mark_task_scheduled(sub, task["id"], start_time, end_time)
-
-    return jsonify(
-        {
-            "scheduled_tasks": [t["task"] for t in scheduled_tasks],
-            "calendar_responses": event_responses,
-        }
-    )
+    days = data.get("days")
+    if days is not None and (not isinstance(days, int) or not 1 <= days <= MAX_HORIZON_DAYS):
+        return jsonify({"error": f"'days' must be between 1 and {MAX_HORIZON_DAYS}"}), 400
 
+    try:
+        return jsonify(schedule_service.preview_schedule(sub, days)), 200
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
 
-@schedule_bp.post("/schedule_notifications")
-def handle_schedule_notifications():
+
+@schedule_bp.post("/schedule_confirm")
+def schedule_confirm_route():
     data = request.get_json()
     sub = data.get("sub")
+    plan_id = data.get("plan_id")
+    if not sub or not plan_id:
+        return jsonify({"error": "Missing 'sub' or 'plan_id' in request"}), 400
 
-    user = user_repo.find_by_sub(sub)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    return _run_or_enqueue("confirm_plan", data, sub=sub, plan_id=plan_id)
 
-    access_token = user.get("accessToken")
-    if not access_token:
-        return jsonify({"error": "Missing access token"}), 400
 
-    user_timezone = calendar_client.get_primary_timezone(access_token)
-    responses = schedule_notification_reminders(access_token, user_timezone)
+@schedule_bp.get("/plan")
+def get_plan():
+    sub = request.args.get("sub")
+    if not sub:
+        return jsonify({"error": "Missing 'sub' in request"}), 400
+
+    plan = plan_repo.find_by_sub(sub)
+    if not plan:
+        return jsonify({"error": "No plan found"}), 404
+
+    return jsonify(plan), 200
 
-    return jsonify({"scheduled_notifications": responses})
+
+@schedule_bp.post("/schedule_notifications")
+def handle_schedule_notifications():
+    data = request.get_json()
+    sub = data.get("sub")
+    if not sub:
+        return jsonify({"error": "Missing 'sub' in request"}), 400
+
+    return _run_or_enqueue("schedule_notifications", data, sub=sub)
 
 
 
@@ -112,7 +113,7 @@ def get_user_calendar_events():
     if not access_token:
         return jsonify({"error": "Missing access token"}), 400
 
-    user_timezone = calendar_client.get_primary_timezone(access_token)
+    user_timezone = timezone_cache.get(user)
     tz = pytz.timezone(user_timezone)
 
     today = datetime.now(tz)
@@ -127,7 +128,7 @@ def get_user_calendar_events():
     }
 
     try:
-        events = calendar_client.list_events(access_token, "primary", params)
+        events = _events_for_window(sub, access_token, params)
     except Exception as e:
         return jsonify({"error": "Failed to fetch events", "details": str(e)}), 500
 
@@ -152,6 +153,19 @@ def get_user_calendar_events():
 
     return jsonify(events), 200
 
+
+def _events_for_window(sub: str, access_token: str, params: dict):
+    """Today's events from the synced mirror when enabled, else straight from Calendar."""
+    if calendar_sync is not None:
+        try:
+            time_min = datetime.fromisoformat(params["timeMin"])
+            time_max = datetime.fromisoformat(params["timeMax"])
+            calendar_sync.sync(sub, access_token, "primary", until=time_max)
+            return calendar_sync.events_between(sub, ["primary"], time_min, time_max)
+        except Exception:
+            pass
+    return calendar_client.list_events(access_token, "primary", params)
+
 def parse_time(time_str, date, tz):
     
     try:
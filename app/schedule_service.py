@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+from .calendar_client import BATCH_LIMIT
+from .deps import (
+    user_repo,
+    task_repo,
+    plan_preview_repo,
+    plan_cache,
+    scheduler,
+    calendar_client,
+    calendar_sync,
+    timezone_cache,
+    SCHEDULE_TASK_LIMIT,
+)
+from .fanout import run_bounded
+from .jobs import JobError, register
+from .notifications_service import schedule_notification_reminders
+from .plan_cache import plan_fingerprint
+from .prefetch import prefetch_scheduling_inputs
+from .utils import parse_time
+
+
+def _noop_progress(stage: str, done: int = 0, total: int = 0):
+    pass
+
+
+def _load_user(sub: str) -> dict:
+    user = user_repo.find_by_sub(sub)
+    if not user:
+        raise JobError("User not found", 404)
+    if not user.get("accessToken"):
+        raise JobError("Missing access token", 400)
+    return user
+
+
+@register("schedule_tasks")
+def schedule_tasks_for_user(progress=_noop_progress, sub: str = None, days: int = None) -> dict:
+    user = _load_user(sub)
+    access_token = user["accessToken"]
+    days = days or scheduler.horizon_days
+
+    progress("prefetching")
+    inputs = _prefetch(user, days)
+
+    progress("finding_slots")
+    available_slots = scheduler.find_optimal_slots(
+        access_token, days, user_timezone=inputs.timezone, user=user, busy=inputs.busy
+    )
+    scheduled_tasks = scheduler.schedule_tasks_in_slots(inputs.tasks, available_slots)
+
+    return _commit_scheduled(progress, sub, access_token, inputs.timezone, scheduled_tasks)
+
+
+def _prefetch(user: dict, days: int):
+    inputs = prefetch_scheduling_inputs(
+        user, scheduler, task_repo, timezone_cache, days, SCHEDULE_TASK_LIMIT
+    )
+    # Tasks arrive already filtered and ranked by priority in Mongo.
+    if not inputs.tasks:
+        raise JobError("No incomplete tasks found", 404)
+    return inputs
+
+
+def _commit_scheduled(progress, sub: str, access_token: str, user_timezone: str, scheduled_tasks: list) -> dict:
+    """Create Calendar events for placed tasks and mark them scheduled."""
+    tz = pytz.timezone(user_timezone)
+    calendar_id = "primary"
+    event_requests = []
+
+    for task in scheduled_tasks:
+        start_date_str, start_time_str = task["start_time"].split(" ")
+        end_date_str, end_time_str = task["end_time"].split(" ")
+
+        start_time = parse_time(
+            start_time_str,
+            datetime.strptime(start_date_str, "%Y-%m-%d"),
+            tz,
+        )
+        end_time = parse_time(
+            end_time_str,
+            datetime.strptime(end_date_str, "%Y-%m-%d"),
+            tz,
+        )
+
+        event_details = {
+            "summary": f"{task['task']} 💙 TimeFinder",
+            "start": {"dateTime": start_time.isoformat(), "timeZone": user_timezone},
+            "end": {"dateTime": end_time.isoformat(), "timeZone": user_timezone},
+            "colorId": "5",
+        }
+        event_requests.append((task, event_details, start_time, end_time))
+
+    progress("creating_events", 0, len(event_requests))
+
+    # Each chunk is one batch HTTP request; chunks run concurrently, capped
+    # per user.
+    chunks = [
+        event_requests[i:i + BATCH_LIMIT] for i in range(0, len(event_requests), BATCH_LIMIT)
+    ]
+    chunk_results = run_bounded(
+        lambda chunk: calendar_client.create_events(
+            access_token, calendar_id, [details for _, details, _, _ in chunk]
+        ),
+        chunks,
+        key=sub,
+    )
+
+    created = []
+    failed_tasks = []
+
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        results = chunk_result.value if chunk_result.ok else [None] * len(chunk)
+        for (task, _, start_time, end_time), result in zip(chunk, results):
+            if result is None or not result.ok:
+                error = result.error if result is not None else chunk_result.error
+                failed_tasks.append({"task": task["task"], "id": task["id"], "error": error})
+            else:
+                created.append((task, result.body, start_time, end_time))
+
+    progress("saving", len(created), len(event_requests))
+
+    if calendar_sync is not None and created:
+        # Write through so reads before the next sync already see the new events.
+        try:
+            calendar_sync.apply(sub, calendar_id, [body for _, body, _, _ in created])
+        except Exception:
+            pass
+
+    bookkeeping_error = None
+    try:
+        task_repo.mark_tasks_scheduled(
+            sub, [(task["id"], start_time, end_time) for task, _, start_time, end_time in created]
+        )
+    except Exception as e:
+        # The events exist; only our bookkeeping failed. Those tasks are
+        # still reported as scheduled, with the failure under its own key.
+        bookkeeping_error = {
+            "error": str(e),
+            "task_ids": [str(task["id"]) for task, _, _, _ in created],
+        }
+
+    result = {
+        "scheduled_tasks": [task["task"] for task, _, _, _ in created],
+        "calendar_responses": [body for _, body, _, _ in created],
+        "failed_tasks": failed_tasks,
+    }
+    if bookkeeping_error:
+        result["bookkeeping_error"] = bookkeeping_error
+    return result
+
+
+def preview_schedule(sub: str, days: int = None) -> dict:
+    """
+    Compute a plan without touching the calendar. Plans are memoized by a
+    fingerprint of their inputs, which is also the planId to confirm with.
+    """
+    user = _load_user(sub)
+    access_token = user["accessToken"]
+    days = days or scheduler.horizon_days
+
+    inputs = _prefetch(user, days)
+    user_timezone = inputs.timezone
+    tz = pytz.timezone(user_timezone)
+    sorted_tasks = inputs.tasks
+
+    now, origin, horizon_end = scheduler.horizon(tz, days)
+    busy = inputs.busy
+    if busy is None:
+        busy = scheduler.fetch_busy(access_token, origin, horizon_end, tz, user)
+    # Only periods inside the horizon belong in the fingerprint.
+    busy = [(start, end) for start, end in busy if end > origin and start < horizon_end]
+    availability = scheduler.get_availability(access_token, user)
+
+    plan_id = plan_fingerprint(
+        busy,
+        sorted_tasks,
+        availability.to_document(),
+        user_timezone,
+        days,
+        origin + timedelta(minutes=scheduler.earliest_offset(origin, now)),
+        {"engine": scheduler.engine, "buffer": scheduler.buffer_minutes},
+    )
+    cached = plan_cache.get(sub, plan_id)
+    if cached:
+        return {**cached, "cached": True}
+
+    slots = scheduler.build_slots(busy, now, origin, tz, days, availability)
+    plan = {
+        "planId": plan_id,
+        "sub": sub,
+        "timeZone": user_timezone,
+        "days": days,
+        "scheduled_tasks": scheduler.schedule_tasks_in_slots(sorted_tasks, slots),
+        "generatedAt": datetime.now(timezone.utc),
+    }
+    plan_cache.put(sub, plan)
+    # Lets a confirm that lands on another worker find the plan.
+    plan_preview_repo.save(plan, plan_cache.ttl_seconds)
+    return {**plan, "cached": False}
+
+
+@register("confirm_plan")
+def confirm_plan_for_user(progress=_noop_progress, sub: str = None, plan_id: str = None) -> dict:
+    """Commit a previewed plan as-is: no recomputation and no Calendar reads."""
+    user = _load_user(sub)
+
+    # Both stores expire plans after PLAN_CACHE_TTL: older plans may clash
+    # with meetings added since, or lie in the past.
+    plan = plan_cache.get(sub, plan_id) or plan_preview_repo.find(sub, plan_id)
+    if plan is None:
+        raise JobError("Plan not found or expired; request a new preview", 404)
+
+    # Skip tasks deleted, completed or scheduled since the preview, and say so.
+    open_ids = task_repo.find_open_task_ids(sub, [t["id"] for t in plan["scheduled_tasks"]])
+    scheduled_tasks = [t for t in plan["scheduled_tasks"] if str(t["id"]) in open_ids]
+    dropped_tasks = [
+        {"task": t["task"], "id": t["id"], "reason": "No longer open"}
+        for t in plan["scheduled_tasks"] if str(t["id"]) not in open_ids
+    ]
+
+    result = _commit_scheduled(progress, sub, user["accessToken"], plan["timeZone"], scheduled_tasks)
+    result["dropped_tasks"] = dropped_tasks
+    return result
+
+
+@register("schedule_notifications")
+def schedule_notifications_for_user(progress=_noop_progress, sub: str = None) -> dict:
+    user = _load_user(sub)
+    user_timezone = timezone_cache.get(user)
+
+    progress("provisioning")
+    try:
+        responses, failures = schedule_notification_reminders(user["accessToken"], user_timezone)
+    except Exception as e:
+        raise JobError(f"Failed to fetch events: {e}", 500)
+
+    return {"scheduled_notifications": responses, "failed_notifications": failures}
@@ -1,191 +1,274 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
 import pytz
 
+from . import metrics
+from .availability import AvailabilityProfile, compile_day
 from .calendar_client import GoogleCalendarClient
 from .repositories import UserRepository
 from .models import Task
+from .minute_grid import MinuteGrid
+from .slot_index import SlotIndex
+from .freebusy import (
+    Interval,
+    event_interval,
+    free_intervals,
+    local_midnight,
+    offset_to_datetime,
+    parse_rfc3339,
+    to_offset,
+)
+
+SLOT_MINUTES = 30
+START_ROUNDING_MINUTES = 15
+
+# "slots" places tasks at 30-minute slot boundaries; "numpy" works on a
+# minute-resolution grid (see MinuteGrid).
+ENGINE_SLOTS = "slots"
+ENGINE_NUMPY = "numpy"
+
+# Absolute (start, end) of busy time, timezone-aware, without the buffer.
+BusyPeriod = Tuple[datetime, datetime]
 
 class Scheduler:
-    def __init__(self, calendar_client: GoogleCalendarClient, user_repo: UserRepository, buffer_minutes: int = 10):
+    def __init__(self, calendar_client: GoogleCalendarClient, user_repo: UserRepository, buffer_minutes: int = 10, horizon_days: int = 1, calendar_sync=None, engine: str = ENGINE_SLOTS):
+        if engine not in (ENGINE_SLOTS, ENGINE_NUMPY):
+            raise ValueError(f"Unknown scheduler engine '{engine}'")
         self.calendar_client = calendar_client
         self.user_repo = user_repo
         self.buffer_minutes = buffer_minutes
+        self.horizon_days = horizon_days
+        # Optional CalendarSync; when set, busy time is read from the local mirror.
+        self.calendar_sync = calendar_sync
+        self.engine = engine
     
     def sort_tasks(self, tasks: List[Task]) -> List[Task]:
         
         return sorted(tasks, key=lambda t: t.priority_value, reverse=True)
     
-    def find_optimal_slots(self, access_token: str) -> List[Dict[str, Any]]:
+    def find_optimal_slots(self, access_token: str, days: Optional[int] = None, user_timezone: Optional[str] = None, user: Optional[dict] = None, calendar_ids: Optional[List[str]] = None, busy: Optional[List[BusyPeriod]] = None) -> List[Dict[str, Any]]:
+        """
+        Callers that already hold the timezone, the user document, the
+        calendar IDs or the busy periods can pass them in to skip the
+        corresponding lookups.
+        """
 
-        user_timezone = self.calendar_client.get_primary_timezone(access_token)
+        days = days or self.horizon_days
+        user_timezone = user_timezone or self.calendar_client.get_primary_timezone(access_token)
         local_timezone = pytz.timezone(user_timezone)
-        today = datetime.now(tz=local_timezone).strftime("%Y-%m-%d")
+        now, origin, horizon_end = self.horizon(local_timezone, days)
 
-        day_start = local_timezone.localize(
-            datetime.strptime(f"{today} 08:00", "%Y-%m-%d %H:%M")
-        )
-        day_end = local_timezone.localize(
-            datetime.strptime(f"{today} 20:00", "%Y-%m-%d %H:%M")
-        )
-        slots: List[Tuple[datetime, datetime]] = [(day_start, day_end)]
-
-       
-        params = {
-            "timeMin": f"{today}T00:00:00Z",
-            "timeMax": f"{today}T23:59:59Z",
-            "singleEvents": True,
-            "orderBy": "startTime",
-        }
-
-        events = self.calendar_client.list_events(access_token, "primary", params)
-        buffer_duration = timedelta(minutes=self.buffer_minutes)
-
-        for event in events:
-            start_dt_str = event.get("start", {}).get("dateTime")
-            end_dt_str = event.get("end", {}).get("dateTime")
-           
-            if not start_dt_str or not end_dt_str:
-                continue
-
-            event_start = datetime.fromisoformat(start_dt_str).astimezone(local_timezone)
-            event_end = datetime.fromisoformat(end_dt_str).astimezone(local_timezone) + buffer_duration
-
-            new_slots: List[Tuple[datetime, datetime]] = []
-            for slot in slots:
-                new_slots.extend(self._adjust_slot_for_event(slot, event_start, event_end))
-            slots = new_slots
-
-        return self._calculate_slot_status(slots, access_token, user_timezone)
+        if busy is None:
+            busy = self.fetch_busy(access_token, origin, horizon_end, local_timezone, user, calendar_ids)
+        availability = self.get_availability(access_token, user)
+        return self.build_slots(busy, now, origin, local_timezone, days, availability)
+
+    def horizon(self, tz, days: int) -> Tuple[datetime, datetime, datetime]:
+        """(now, local midnight today, local midnight after the last day)."""
+        now = datetime.now(tz=tz)
+        origin = local_midnight(now.date(), tz)
+        return now, origin, local_midnight(now.date() + timedelta(days=days), tz)
+
+    def fetch_busy(self, access_token: str, start: datetime, end: datetime, tz, user: Optional[dict] = None, calendar_ids: Optional[List[str]] = None) -> List[BusyPeriod]:
+        """Busy periods between `start` and `end`, from the event mirror if enabled."""
+        sub = user.get("sub") if user else None
+        with metrics.timer("scheduler_phase_duration_seconds", phase="fetch_busy"):
+            if self.calendar_sync is not None and sub:
+                return self._mirrored_busy(sub, access_token, start, end, tz, calendar_ids)
+            return self._fetch_busy(access_token, start, end, tz.zone, calendar_ids)
+
+    def build_slots(self, busy: List[BusyPeriod], now: datetime, origin: datetime, tz, days: int, availability: Optional[AvailabilityProfile] = None) -> List[Dict[str, Any]]:
+        """Working windows minus busy time (plus buffer), cut into slot dicts."""
+        availability = availability or AvailabilityProfile.for_user(None)
+        with metrics.timer("scheduler_phase_duration_seconds", phase="build_slots"):
+            windows, concentration_windows = self._availability_windows(origin, now, tz, days, availability)
+            intervals = [
+                (to_offset(start, origin), to_offset(end, origin) + self.buffer_minutes)
+                for start, end in busy
+            ]
+            free = free_intervals(windows, intervals)
+            return self._calculate_slot_status(free, origin, concentration_windows, tz.zone)
     
     def schedule_tasks_in_slots(self, sorted_tasks: List[Task], available_slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-      
+
+        with metrics.timer("scheduler_phase_duration_seconds", phase="placement", engine=self.engine):
+            return self._place_tasks(sorted_tasks, available_slots)
+
+    def _place_tasks(self, sorted_tasks: List[Task], available_slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         scheduled_tasks: List[Dict[str, Any]] = []
         medium_concentration_tasks: List[Task] = []
+        if self.engine == ENGINE_NUMPY:
+            index = MinuteGrid(available_slots)
+            place = self._place_task_on_grid
+        else:
+            index = SlotIndex(available_slots)
+            place = self._place_task
 
         for task in sorted_tasks:
             conc = task.concentration
             if conc == "high":
-                target_slots = [
-                    s for s in available_slots if s["concentration_time"] and s["available"]
-                ]
+                place(task, index, scheduled_tasks, concentration_time=True)
             elif conc == "low":
-                target_slots = [
-                    s for s in available_slots if not s["concentration_time"] and s["available"]
-                ]
+                place(task, index, scheduled_tasks, concentration_time=False)
             else:
                 medium_concentration_tasks.append(task)
-                continue
-
-            for slot in target_slots:
-                if self._fits_time_slot(task, slot, available_slots):
-                    self._schedule_task(task, slot, scheduled_tasks, available_slots)
-                    break
         
         for task in medium_concentration_tasks:
-            target_slots = [
-                s for s in available_slots if s["concentration_time"] and s["available"]
-            ]
-            scheduled = False
-            for slot in target_slots:
-                if self._fits_time_slot(task, slot, available_slots):
-                    self._schedule_task(task, slot, scheduled_tasks, available_slots)
-                    scheduled = True
-                    break
-
-            if not scheduled:
-                for slot in [s for s in available_slots if s["available"]]:
-                    if self._fits_time_slot(task, slot, available_slots):
-                        self._schedule_task(task, slot, scheduled_tasks, available_slots)
-                        break
+            if not place(task, index, scheduled_tasks, concentration_time=True):
+                place(task, index, scheduled_tasks, concentration_time=None)
 
         return scheduled_tasks
     
-    def _get_concentration_time(self, access_token: str):
-        user = self.user_repo.find_by_access_token(access_token)
-        if user and "concentration_time" in user:
-            times = user["concentration_time"]
-            return times.get("start"), times.get("end")
-        return None
+    def get_availability(self, access_token: str, user: Optional[dict] = None) -> AvailabilityProfile:
+        if user is None:
+            user = self.user_repo.find_by_access_token(access_token)
+        return AvailabilityProfile.for_user(user)
     
-    def _calculate_slot_status(self, slots: List[Tuple[datetime, datetime]], access_token: str, timezone: str) -> List[Dict[str, Any]]:
+    def _fetch_busy(self, access_token: str, origin: datetime, horizon_end: datetime, timezone: str, calendar_ids: Optional[List[str]] = None) -> List[BusyPeriod]:
+        """
+        Busy periods across all of the user's calendars for the whole
+        horizon, from a single freeBusy query.
+        """
+        if calendar_ids is None:
+            calendar_ids = self.calendar_client.list_calendar_ids(access_token) or ["primary"]
+
+        busy_by_calendar = self.calendar_client.free_busy(
+            access_token, calendar_ids, origin.isoformat(), horizon_end.isoformat(), timezone
+        )
+
+        busy: List[BusyPeriod] = []
+        for periods in busy_by_calendar.values():
+            for period in periods:
+                busy.append((parse_rfc3339(period["start"]), parse_rfc3339(period["end"])))
+        return busy
+
+    def _mirrored_busy(self, sub: str, access_token: str, origin: datetime, horizon_end: datetime, tz, calendar_ids: Optional[List[str]] = None) -> List[BusyPeriod]:
+        """
+        Busy periods from the synced event mirror. Falls back to a freeBusy
+        query if the sync itself fails.
+        """
+        if calendar_ids is None:
+            calendar_ids = self.calendar_client.list_calendar_ids(access_token) or ["primary"]
+
+        try:
+            for calendar_id in calendar_ids:
+                self.calendar_sync.sync(sub, access_token, calendar_id, until=horizon_end)
+        except Exception:
+            return self._fetch_busy(access_token, origin, horizon_end, tz.zone, calendar_ids)
+
+        busy: List[BusyPeriod] = []
+        for event in self.calendar_sync.events_between(sub, calendar_ids, origin, horizon_end):
+            interval = event_interval(event, origin, tz)
+            if interval is not None:
+                busy.append((
+                    offset_to_datetime(interval[0], origin, tz),
+                    offset_to_datetime(interval[1], origin, tz),
+                ))
+        return busy
+
+    def earliest_offset(self, origin: datetime, now: datetime) -> int:
+        # Nothing is scheduled in the past: today's window opens at the next
+        # quarter hour.
+        earliest = to_offset(now, origin) + 1
+        return earliest + -earliest % START_ROUNDING_MINUTES
+
+    def _availability_windows(self, origin: datetime, now: datetime, tz, days: int, availability: AvailabilityProfile):
+        """
+        Working and concentration windows over the horizon, in minutes from
+        `origin`, from the profile's compiled (and cached) per-day intervals.
+        """
+        windows: List[Interval] = []
+        concentration_windows: List[Interval] = []
+        earliest = self.earliest_offset(origin, now)
+
+        for day_number in range(days):
+            day = origin.date() + timedelta(days=day_number)
+            working, concentration = compile_day(availability, tz.zone, day)
+            shift = to_offset(local_midnight(day, tz), origin)
+
+            for start, end in working:
+                start = max(start + shift, earliest)
+                if start < end + shift:
+                    windows.append((start, end + shift))
+            concentration_windows.extend((start + shift, end + shift) for start, end in concentration)
+
+        return windows, concentration_windows
+
+    def _calculate_slot_status(self, free: List[Interval], origin: datetime, concentration_windows: List[Interval], timezone: str) -> List[Dict[str, Any]]:
     
         all_slots: List[Dict[str, Any]] = []
-        user_concentration_times = self._get_concentration_time(access_token)
         tz = pytz.timezone(timezone)
-        today_date = datetime.now(tz).date()
-
-        for slot_start, slot_end in slots:
-            current_time = slot_start
-            while current_time < slot_end:
-                slot_end_interval = min(current_time + timedelta(minutes=30), slot_end)
-                is_concentration_time = False
-
-                if user_concentration_times:
-                    user_start_datetime = self._parse_time(user_concentration_times[0], today_date, tz)
-                    user_end_datetime = self._parse_time(user_concentration_times[1], today_date, tz)
-                    is_concentration_time = (
-                        user_start_datetime <= current_time
-                        and slot_end_interval <= user_end_datetime
-                    )
+
+        window_position = 0
+        for free_start, free_end in free:
+            current = free_start
+            while current < free_end:
+                slot_end = min(current + SLOT_MINUTES, free_end)
+
+                # Slots come out in time order, so the matching concentration
+                # window only ever moves forward.
+                while (
+                    window_position < len(concentration_windows)
+                    and concentration_windows[window_position][1] <= current
+                ):
+                    window_position += 1
+
+                is_concentration_time = (
+                    window_position < len(concentration_windows)
+                    and concentration_windows[window_position][0] <= current
+                    and slot_end <= concentration_windows[window_position][1]
+                )
 
                 all_slots.append(
                     {
-                        "start": current_time,
-                        "end": slot_end_interval,
+                        "start": offset_to_datetime(current, origin, tz),
+                        "end": offset_to_datetime(slot_end, origin, tz),
                         "available": True,
                         "concentration_time": is_concentration_time,
                     }
                 )
-                current_time += timedelta(minutes=30)
+                current += SLOT_MINUTES
 
         return all_slots
     
-    def _adjust_slot_for_event(self, slot: Tuple[datetime, datetime], event_start: datetime, event_end: datetime) -> List[Tuple[datetime, datetime]]:
-        slot_start, slot_end = slot
-        new_slots: List[Tuple[datetime, datetime]] = []
+    def _place_task(self, task: Task, index: SlotIndex, scheduled_tasks: List[Dict[str, Any]], concentration_time=None) -> bool:
+        """
+        Schedule `task` at the first available slot whose concentration flag
+        matches (any slot when `concentration_time` is None) and that starts
+        a long enough contiguous run. Returns whether it was placed.
+        """
+        required_minutes = task.time_minutes + self.buffer_minutes
+        position = index.next_free(0, concentration_time)
 
-        if slot_start < event_start:
-            new_slots.append((slot_start, min(slot_end, event_start)))
-        if slot_end > event_end:
-            new_slots.append((max(slot_start, event_end), slot_end))
-
-        return new_slots if new_slots else [slot]
-    
-    def _fits_time_slot(self, task: Task, slot: Dict[str, Any], available_slots: List[Dict[str, Any]]) -> bool:
-        buffer_duration = timedelta(minutes=self.buffer_minutes)
-        task_duration = timedelta(minutes=task.time_minutes)
-        required_duration = task_duration + buffer_duration
-
-        start_index = available_slots.index(slot)
-        accumulated_time = timedelta()
-
-        for i in range(start_index, len(available_slots)):
-            if not available_slots[i]["available"]:
-                break
-            current_slot_duration = available_slots[i]["end"] - available_slots[i]["start"]
-            accumulated_time += current_slot_duration
-            if accumulated_time >= required_duration:
+        while position is not None:
+            if index.fits(position, required_minutes):
+                self._schedule_task(task, index.slots[position], scheduled_tasks, index)
                 return True
 
+            # Every later start in the same run has even less room left.
+            position = index.next_free(max(index.run_end(position), position + 1), concentration_time)
+
         return False
 
-    def _mark_slots_as_used(self, start_time: datetime, end_time: datetime, slots: List[Dict[str, Any]]):
-        
-        buffer_duration = timedelta(minutes=self.buffer_minutes)
-        adjusted_start = start_time
-        adjusted_end = end_time + buffer_duration
+    def _place_task_on_grid(self, task: Task, grid: MinuteGrid, scheduled_tasks: List[Dict[str, Any]], concentration_time=None) -> bool:
+        """Minute-resolution counterpart of _place_task."""
+        required_minutes = task.time_minutes + self.buffer_minutes
+        offset = grid.first_fit(required_minutes, concentration_time)
+        if offset is None:
+            return False
 
-        for slot in slots:
-            slot_start = slot["start"]
-            slot_end = slot["end"]
-            if slot_start < adjusted_end and slot_end > adjusted_start:
-                slot["available"] = False
+        self._append_scheduled(task, grid.to_datetime(offset), scheduled_tasks)
+        grid.mark_used(offset, offset + required_minutes)
+        return True
 
-    def _schedule_task(self, task: Task, slot: Dict[str, Any], scheduled_tasks: List[Dict[str, Any]], available_slots: List[Dict[str, Any]]):
+    def _schedule_task(self, task: Task, slot: Dict[str, Any], scheduled_tasks: List[Dict[str, Any]], index: SlotIndex):
         
         start_time = slot["start"]
+        end_time = self._append_scheduled(task, start_time, scheduled_tasks)
+        index.mark_used(start_time, end_time + timedelta(minutes=self.buffer_minutes))
+
+    def _append_scheduled(self, task: Task, start_time: datetime, scheduled_tasks: List[Dict[str, Any]]) -> datetime:
         end_time = start_time + timedelta(minutes=task.time_minutes)
 
         scheduled_tasks.append(
@@ -198,15 +281,4 @@ class Scheduler:
                 "isScheduled": task.is_scheduled,
             }
         )
-
-        self._mark_slots_as_used(start_time, end_time, available_slots)
-
-    @staticmethod
-    def _parse_time(time_str: str, date, tz):
-        
-        try:
-            t = datetime.strptime(time_str, "%H:%M").time()
-        except ValueError:
-            t = datetime.strptime(time_str, "%H:%M:%S").time()
-        return tz.localize(datetime.combine(date, t))
-    
+        return end_time
@@ -0,0 +1,91 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class SlotIndex:
+    """
+    Positional index over the slot dicts produced by Scheduler.find_optimal_slots.
+
+    Keeps cumulative slot durations (prefix sums) plus sorted position
+    lists: where time stops being contiguous, which slots are already taken,
+    and which are still free, overall and per concentration flag. A fit
+    query is then two bisects and a subtraction, finding the next free
+    slot of a concentration class is one bisect, and marking a time range
+    only visits the slots inside it.
+    """
+
+    def __init__(self, slots: List[Dict[str, Any]]):
+        self.slots = slots
+        self.starts: List[datetime] = [s["start"] for s in slots]
+        self.ends: List[datetime] = [s["end"] for s in slots]
+
+        self.prefix: List[float] = [0.0]
+        for start, end in zip(self.starts, self.ends):
+            self.prefix.append(self.prefix[-1] + (end - start).total_seconds() / 60)
+
+        # breaks[k] means slot k does not start where slot k-1 ended.
+        self.breaks: List[int] = [
+            i for i in range(1, len(slots)) if self.starts[i] != self.ends[i - 1]
+        ]
+        self.blocked: List[int] = [i for i, s in enumerate(slots) if not s["available"]]
+
+        # Free positions, keyed by concentration flag (None: any slot).
+        self.free: Dict[Optional[bool], List[int]] = {None: [], True: [], False: []}
+        for i, slot in enumerate(slots):
+            if slot["available"]:
+                self.free[None].append(i)
+                self.free[bool(slot["concentration_time"])].append(i)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def is_available(self, position: int) -> bool:
+        return self.slots[position]["available"]
+
+    def run_end(self, position: int) -> int:
+        """First position after `position` that cannot extend a run starting there."""
+        stop = len(self.slots)
+
+        b = bisect_right(self.breaks, position)
+        if b < len(self.breaks):
+            stop = min(stop, self.breaks[b])
+
+        u = bisect_left(self.blocked, position)
+        if u < len(self.blocked):
+            stop = min(stop, self.blocked[u])
+
+        return stop
+
+    def next_free(self, position: int, concentration_time: Optional[bool] = None) -> Optional[int]:
+        """First free position >= `position` with the given concentration flag."""
+        positions = self.free[concentration_time]
+        i = bisect_left(positions, position)
+        return positions[i] if i < len(positions) else None
+
+    def free_minutes_from(self, position: int) -> float:
+        if not self.is_available(position):
+            return 0.0
+        return self.prefix[self.run_end(position)] - self.prefix[position]
+
+    def fits(self, position: int, minutes: float) -> bool:
+        return self.free_minutes_from(position) >= minutes
+
+    def mark_used(self, start: datetime, end: datetime):
+        # Slots are sorted and non-overlapping, so ends are sorted as well.
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+
+        for position in range(first, last):
+            slot = self.slots[position]
+            if slot["available"]:
+                slot["available"] = False
+                insort(self.blocked, position)
+                self._remove_free(None, position)
+                self._remove_free(bool(slot["concentration_time"]), position)
+
+    def _remove_free(self, concentration_time: Optional[bool], position: int):
+        positions = self.free[concentration_time]
+        i = bisect_left(positions, position)
+        if i < len(positions) and positions[i] == position:
+            del positions[i]
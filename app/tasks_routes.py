@@ -1,10 +1,37 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+import hashlib
+import re
 
 from .deps import task_repo
 
 tasks_bp = Blueprint("tasks", __name__)
 
+MAX_PAGE_SIZE = 500
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _parse_bool(value):
+    if value is None:
+        return None
+    if value.lower() in ("true", "1"):
+        return True
+    if value.lower() in ("false", "0"):
+        return False
+    raise ValueError(f"Expected true/false, got '{value}'")
+
+
+def _parse_limit(value):
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"'limit' must be a positive integer, got '{value}'")
+    if limit < 1:
+        raise ValueError(f"'limit' must be a positive integer, got '{value}'")
+    return limit
+
 
 @tasks_bp.post("/tasks")
 def create_or_update_tasks():
@@ -53,25 +80,68 @@ def get_tasks():
     if not sub:
         return jsonify({"message": "Missing 'sub' in request"}), 400
 
-    tasks_data = task_repo.find_by_sub(sub)
-    if not tasks_data:
+    # The ETag only depends on the version counter and the query, so an
+    # unchanged poll is answered with a single small read.
+    version = task_repo.get_version(sub)
+    if version is None:
         return jsonify({"message": "No tasks found for the user"}), 404
 
-    return jsonify({"tasks": tasks_data.get("tasks", [])}), 200
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    etag = f"{version}-{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+    if request.if_none_match.contains_weak(etag):
+        return "", 304, {"ETag": f'W/"{etag}"'}
+
+    try:
+        limit = _parse_limit(request.args.get("limit"))
+        after = request.args.get("after")
+        completed = _parse_bool(request.args.get("completed"))
+        scheduled = _parse_bool(request.args.get("scheduled"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    fields = None
+    if request.args.get("fields"):
+        fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+        if not all(FIELD_NAME.match(f) for f in fields):
+            return jsonify({"message": "Invalid field name in 'fields'"}), 400
+        if "id" not in fields:
+            fields.append("id")
+
+    paginated = any(v is not None for v in (limit, after, completed, scheduled, fields))
+
+    if not paginated:
+        tasks_data = task_repo.find_by_sub(sub)
+        if not tasks_data:
+            return jsonify({"message": "No tasks found for the user"}), 404
+        body = {"tasks": tasks_data.get("tasks", [])}
+    else:
+        limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+        try:
+            tasks, next_cursor = task_repo.find_page(sub, limit, after, fields, completed, scheduled)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        body = {"tasks": tasks, "next_cursor": next_cursor}
+
+    response = jsonify(body)
+    response.set_etag(etag, weak=True)
+    return response, 200
 
 
 @tasks_bp.post("/update-completion")
 def update_task_completion():
     data = request.get_json()
-    if not data or "id" not in data or "isCompleted" not in data:
+    if not data or "sub" not in data or "id" not in data or "isCompleted" not in data:
         return jsonify({"status": "error", "message": "Invalid data provided."}), 400
 
+    sub = data["sub"]
     task_id = data["id"]
     is_completed = data["isCompleted"]
 
-    result = task_repo.update_task_completion(task_id, is_completed)
+    result = task_repo.update_task_completion(sub, task_id, is_completed)
 
-    if result.modified_count > 0:
+    if result.matched_count == 0:
+        return jsonify({"status": "error", "message": "Task not found."}), 404
+    elif result.modified_count > 0:
         return jsonify({"status": "success", "message": "Task updated successfully."}), 200
     else:
-        return jsonify({"status": "error", "message": "Task not found or no changes made."}), 404
\ No newline at end of file
+        return jsonify({"status": "success", "message": "Task already up to date."}), 200
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from .calendar_client import GoogleCalendarClient
+from .repositories import UserRepository
+
+
+class TimezoneCache:
+    """
+    Process-local cache of each user's primary-calendar timezone, keyed by sub.
+
+    A fresh entry is returned as-is. An expired entry is still returned, and a
+    background refresh is started, so requests never wait on Calendar for a
+    value we already know. The resolved timezone is persisted on the user
+    document ("timeZone") so new processes start warm.
+    """
+
+    def __init__(self, calendar_client: GoogleCalendarClient, user_repo: UserRepository, ttl_seconds: float = 6 * 3600, max_workers: int = 2):
+        self.calendar_client = calendar_client
+        self.user_repo = user_repo
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def get(self, user: dict) -> str:
+        sub = user.get("sub")
+        access_token = user.get("accessToken")
+        stored = user.get("timeZone")
+
+        with self._lock:
+            entry = self._entries.get(sub)
+
+        if entry:
+            timezone, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._refresh_in_background(sub, access_token, timezone)
+            return timezone
+
+        if stored:
+            # Serve the persisted value now and confirm it off the request path.
+            self._store(sub, stored, expires_at=0)
+            self._refresh_in_background(sub, access_token, stored)
+            return stored
+
+        return self.refresh(sub, access_token, None) or "UTC"
+
+    def invalidate(self, sub: str):
+        with self._lock:
+            self._entries.pop(sub, None)
+
+    def refresh(self, sub: str, access_token: str, known: Optional[str]) -> Optional[str]:
+        try:
+            timezone = self.calendar_client.get_primary_timezone(access_token, default=None)
+        except Exception:
+            timezone = None
+
+        if not timezone:
+            # Calendar is down or slow: keep serving what we had.
+            if known:
+                self._store(sub, known)
+            return known
+
+        self._store(sub, timezone)
+        if timezone != known:
+            self.user_repo.set_timezone(sub, timezone)
+        return timezone
+
+    def _store(self, sub: str, timezone: str, expires_at: Optional[float] = None):
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[sub] = (timezone, expires_at)
+
+    def _refresh_in_background(self, sub: str, access_token: str, known: str):
+        if not access_token:
+            return
+
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # A forked child inherits the executor but not its threads,
+                # and refreshes in flight in the parent will never finish here.
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="tz-refresh"
+                )
+                self._executor_pid = os.getpid()
+                self._refreshing = set()
+            if sub in self._refreshing:
+                return
+            self._refreshing.add(sub)
+            executor = self._executor
+
+        def run():
+            try:
+                self.refresh(sub, access_token, known)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(sub)
+
+        executor.submit(run)
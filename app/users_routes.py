@@ -1,4 +1,6 @@
 from flask import Blueprint, request, jsonify
+
+from .availability import AvailabilityProfile
 from .deps import user_repo
 
 users_bp = Blueprint("users", __name__)
@@ -40,4 +42,40 @@ def update_concentration_time():
         "status": "success",
         "message": "Concentration times updated.",
         "concentration_time": {"start": start, "end": end},
-    })
\ No newline at end of file
+    })
+
+
+@users_bp.post("/availability")
+def update_availability():
+    data = request.get_json()
+    if not data or "sub" not in data:
+        return jsonify({"status": "error", "message": "Invalid data provided."}), 400
+
+    try:
+        profile = AvailabilityProfile.from_document(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    result = user_repo.upsert_availability(data["sub"], profile.to_document())
+    if result.matched_count == 0:
+        return jsonify({"status": "error", "message": "User not found."}), 404
+
+    return jsonify({
+        "status": "success",
+        "message": "Availability updated.",
+        "availability": profile.to_document(),
+    })
+
+
+@users_bp.get("/availability")
+def get_availability():
+    sub = request.args.get("sub")
+    if not sub:
+        return jsonify({"status": "error", "message": "Missing 'sub'."}), 400
+
+    user = user_repo.get_availability(sub)
+    if not user:
+        return jsonify({"status": "error", "message": "User not found."}), 404
+
+    # The effective profile, including the legacy defaults.
+    return jsonify({"availability": AvailabilityProfile.for_user(user).to_document()})
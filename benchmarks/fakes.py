@@ -0,0 +1,35 @@
+"""In-memory stand-ins for GoogleCalendarClient and UserRepository."""
+from typing import Dict, List, Optional
+
+
+class FakeCalendarClient:
+    """
+    Serves pre-generated busy periods through the subset of the
+    GoogleCalendarClient interface the Scheduler uses. No network.
+    """
+
+    def __init__(self, busy: Dict[str, List[dict]], timezone: str = "UTC"):
+        self.busy = busy
+        self.timezone = timezone
+        self.calls = 0
+
+    def get_primary_timezone(self, access_token: str, default: str = "UTC") -> str:
+        self.calls += 1
+        return self.timezone
+
+    def list_calendar_ids(self, access_token: str) -> List[str]:
+        self.calls += 1
+        return list(self.busy)
+
+    def free_busy(self, access_token: str, calendar_ids: List[str], time_min: str, time_max: str, timezone: Optional[str] = None) -> Dict[str, List[dict]]:
+        self.calls += 1
+        # Workloads are generated inside the horizon, so no window filtering.
+        return {calendar_id: self.busy.get(calendar_id, []) for calendar_id in calendar_ids}
+
+
+class FakeUserRepository:
+    def __init__(self, users: List[dict]):
+        self.by_token = {u["accessToken"]: u for u in users}
+
+    def find_by_access_token(self, access_token: str) -> Optional[dict]:
+        return self.by_token.get(access_token)
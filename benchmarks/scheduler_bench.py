@@ -0,0 +1,215 @@
+"""
+Scheduler benchmarks on generated workloads.
+
+Drives Scheduler.find_optimal_slots and schedule_tasks_in_slots through
+fake Calendar and user clients, and reports the median time of each phase
+plus peak traced memory for every scenario.
+
+    python -m benchmarks.scheduler_bench
+    python -m benchmarks.scheduler_bench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.scheduler_bench --compare benchmarks/baseline.json
+
+Baselines are machine-specific; record one locally before changing the
+scheduler and compare against it afterwards. --compare exits 1 when a
+scenario is slower (or uses more memory) than the baseline by more than
+--tolerance.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from app.models import Task
+from app.scheduler import ENGINE_NUMPY, ENGINE_SLOTS, Scheduler
+
+from .fakes import FakeCalendarClient, FakeUserRepository
+
+ACCESS_TOKEN = "bench-token"
+DAYS = 7
+BUSY_FRACTION = 0.6
+
+EVENTS_PER_DAY = (0, 10, 100, 1000)
+TASK_COUNTS = (5, 50, 500, 5000)
+TIMEZONES = ("UTC", "America/Los_Angeles", "Asia/Kolkata", "Pacific/Chatham")
+CONCENTRATION_WINDOWS = (None, ("09:00", "12:00"), ("13:30", "17:45"), ("06:00", "22:00"))
+
+
+@dataclass
+class Scenario:
+    events_per_day: int
+    tasks: int
+    timezone: str
+    concentration: Optional[Tuple[str, str]]
+    engine: str
+
+    @property
+    def name(self) -> str:
+        window = "-".join(self.concentration) if self.concentration else "none"
+        return f"{self.engine}/events={self.events_per_day}/tasks={self.tasks}/{self.timezone}/conc={window}"
+
+
+@dataclass
+class Result:
+    find_ms: float
+    place_ms: float
+    peak_kib: float
+    slots: int
+    scheduled: int
+
+
+def scenarios(engines: List[str]) -> List[Scenario]:
+    # Every size combination, rotating timezone and concentration window so
+    # each appears across small and large workloads.
+    result = []
+    for i, events in enumerate(EVENTS_PER_DAY):
+        for j, tasks in enumerate(TASK_COUNTS):
+            for engine in engines:
+                result.append(Scenario(
+                    events,
+                    tasks,
+                    TIMEZONES[(i + j) % len(TIMEZONES)],
+                    CONCENTRATION_WINDOWS[(i * 3 + j) % len(CONCENTRATION_WINDOWS)],
+                    engine,
+                ))
+    return result
+
+
+def generate_busy(rng: random.Random, scenario: Scenario) -> Dict[str, List[dict]]:
+    """
+    Events spread over the horizon in UTC, split across three calendars.
+    Durations shrink as the count grows so roughly BUSY_FRACTION of each day
+    stays busy and placement still has room to work with.
+    """
+    tz = pytz.timezone(scenario.timezone)
+    start = tz.localize(datetime.combine(datetime.now(tz).date(), datetime.min.time())).astimezone(pytz.utc)
+    busy = {"primary": [], "work": [], "family": []}
+    calendars = list(busy)
+    mean_minutes = min(60.0, BUSY_FRACTION * 1440 / max(scenario.events_per_day, 1))
+
+    for _ in range(scenario.events_per_day * DAYS):
+        event_start = start + timedelta(minutes=rng.randrange(DAYS * 1440))
+        event_end = event_start + timedelta(minutes=max(1, round(rng.expovariate(1 / mean_minutes))))
+        busy[rng.choice(calendars)].append({
+            "start": event_start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end": event_end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    return busy
+
+
+def generate_tasks(rng: random.Random, count: int) -> List[Task]:
+    levels = ("high", "medium", "low")
+    return [
+        Task(
+            id=i,
+            name=f"task {i}",
+            priority=rng.choice(levels),
+            time_minutes=rng.choice((15, 30, 45, 60, 90, 120, 180)),
+            concentration=rng.choice(levels),
+        )
+        for i in range(count)
+    ]
+
+
+def run_scenario(scenario: Scenario, repeat: int, seed: int) -> Result:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    user = {"sub": "bench", "accessToken": ACCESS_TOKEN}
+    if scenario.concentration:
+        user["concentration_time"] = {"start": scenario.concentration[0], "end": scenario.concentration[1]}
+
+    calendar_client = FakeCalendarClient(generate_busy(rng, scenario), scenario.timezone)
+    scheduler = Scheduler(calendar_client, FakeUserRepository([user]), horizon_days=DAYS, engine=scenario.engine)
+    tasks = scheduler.sort_tasks(generate_tasks(rng, scenario.tasks))
+
+    def once():
+        started = time.perf_counter()
+        slots = scheduler.find_optimal_slots(ACCESS_TOKEN, DAYS)
+        found = time.perf_counter()
+        scheduled = scheduler.schedule_tasks_in_slots(tasks, slots)
+        placed = time.perf_counter()
+        return (found - started) * 1000, (placed - found) * 1000, len(slots), len(scheduled)
+
+    timings = [once() for _ in range(repeat)]
+
+    # Traced separately: tracemalloc slows everything it watches.
+    tracemalloc.start()
+    once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(
+        find_ms=statistics.median(t[0] for t in timings),
+        place_ms=statistics.median(t[1] for t in timings),
+        peak_kib=peak / 1024,
+        slots=timings[-1][2],
+        scheduled=timings[-1][3],
+    )
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, dict], tolerance: float, min_ms: float) -> List[str]:
+    """Describe every metric that regressed beyond `tolerance` (a fraction)."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("find_ms", "place_ms", "peak_kib"):
+            now, before = getattr(result, metric), base[metric]
+            # Sub-millisecond timings are mostly noise.
+            if metric.endswith("_ms") and max(now, before) < min_ms:
+                continue
+            if now > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before:.2f} -> {now:.2f} (+{(now / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler on synthetic workloads.")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario (median is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engine", choices=[ENGINE_SLOTS, ENGINE_NUMPY], action="append",
+                        help="engine(s) to benchmark; default both")
+    parser.add_argument("--filter", default="", help="only run scenarios whose name contains this")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore timing changes below this many ms")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Result] = {}
+    print(f"{'scenario':<78} {'find ms':>9} {'place ms':>9} {'peak KiB':>10} {'slots':>6} {'placed':>6}")
+    for scenario in scenarios(args.engine or [ENGINE_SLOTS, ENGINE_NUMPY]):
+        if args.filter not in scenario.name:
+            continue
+        result = run_scenario(scenario, args.repeat, args.seed)
+        results[scenario.name] = result
+        print(
+            f"{scenario.name:<78} {result.find_ms:>9.2f} {result.place_ms:>9.2f} "
+            f"{result.peak_kib:>10.1f} {result.slots:>6} {result.scheduled:>6}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({name: asdict(r) for name, r in results.items()}, f, indent=2, sort_keys=True)
+        print(f"Saved baseline for {len(results)} scenarios to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import mongomock
+import pytest
+
+from app.calendar_client import GoogleCalendarClient
+from tests.fake_calendar import FakeCalendarServer
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().timefinder
+
+
+@pytest.fixture
+def calendar_server():
+    with FakeCalendarServer() as server:
+        yield server
+
+
+@pytest.fixture
+def calendar_client(calendar_server):
+    return GoogleCalendarClient(calendar_server.base_url, max_retries=0)
@@ -0,0 +1,252 @@
+"""
+A small in-process HTTP stand-in for the Google Calendar API, enough to drive
+GoogleCalendarClient end to end: events.list (time windows, pagination, sync
+tokens with 410 on expiry), events.insert, calendarList, freeBusy and the
+multipart/mixed batch endpoint.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from app.freebusy import parse_rfc3339
+
+API_PREFIX = "/calendar/v3"
+
+
+class FakeCalendar:
+    def __init__(self, time_zone: str = "UTC"):
+        self.time_zone = time_zone
+        self.calendars: Dict[str, Dict[str, dict]] = {"primary": {}}
+        # (sequence, calendar ID, event ID) for every change, for sync tokens.
+        self.changes: List[tuple] = []
+        self.sequence = 0
+        # Tokens issued before this sequence answer 410 Gone.
+        self.oldest_valid_token = 0
+        self.requests: List[dict] = []
+        # Batch parts to answer 429 rateLimitExceeded before serving normally.
+        self.throttled_parts = 0
+        self.batches = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    # Test-side helpers ------------------------------------------------------
+
+    def add_event(self, calendar_id: str, start: str, end: str, summary: str = "event", **fields) -> dict:
+        event = {
+            "summary": summary,
+            "start": {"date": start} if len(start) == 10 else {"dateTime": start},
+            "end": {"date": end} if len(end) == 10 else {"dateTime": end},
+            "status": "confirmed",
+            **fields,
+        }
+        return self._store(calendar_id, event)
+
+    def update_event(self, calendar_id: str, event_id: str, **fields) -> dict:
+        with self._lock:
+            event = self.calendars[calendar_id][event_id]
+            event.update(fields)
+            self._record(calendar_id, event_id)
+            return dict(event)
+
+    def delete_event(self, calendar_id: str, event_id: str, silently: bool = False):
+        """Cancel an event; `silently` skips the change log (as if it fell out of a window)."""
+        with self._lock:
+            if silently:
+                del self.calendars[calendar_id][event_id]
+                return
+            self.calendars[calendar_id][event_id]["status"] = "cancelled"
+            self._record(calendar_id, event_id)
+
+    def expire_sync_tokens(self):
+        with self._lock:
+            self.oldest_valid_token = self.sequence + 1
+
+    # API ----------------------------------------------------------------------
+
+    def _store(self, calendar_id: str, event: dict) -> dict:
+        with self._lock:
+            self._next_id += 1
+            event = {**event, "id": f"evt{self._next_id}"}
+            self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+            self._record(calendar_id, event["id"])
+            return dict(event)
+
+    def _record(self, calendar_id: str, event_id: str):
+        self.sequence += 1
+        self.changes.append((self.sequence, calendar_id, event_id))
+
+    def list_events(self, calendar_id: str, query: Dict[str, str]):
+        with self._lock:
+            events = self.calendars.get(calendar_id, {})
+
+            if "syncToken" in query:
+                since = int(query["syncToken"].rsplit("-", 1)[1])
+                if since < self.oldest_valid_token:
+                    return 410, {"error": {"code": 410, "message": "Sync token is no longer valid"}}
+                changed = {eid for seq, cid, eid in self.changes if cid == calendar_id and seq > since}
+                items = [dict(events[eid]) for eid in sorted(changed) if eid in events]
+            else:
+                time_min = parse_rfc3339(query["timeMin"]) if "timeMin" in query else None
+                time_max = parse_rfc3339(query["timeMax"]) if "timeMax" in query else None
+                items = [
+                    dict(e) for e in events.values()
+                    if e["status"] != "cancelled" and _overlaps(e, time_min, time_max)
+                ]
+
+            offset = int(query.get("pageToken", 0))
+            page_size = int(query.get("maxResults", 250))
+            page = items[offset:offset + page_size]
+            body = {"items": page}
+            if offset + page_size < len(items):
+                body["nextPageToken"] = str(offset + page_size)
+            else:
+                body["nextSyncToken"] = f"{calendar_id}-{self.sequence}"
+            return 200, body
+
+    def free_busy(self, body: dict):
+        time_min, time_max = parse_rfc3339(body["timeMin"]), parse_rfc3339(body["timeMax"])
+        calendars = {}
+        with self._lock:
+            for item in body.get("items", []):
+                events = self.calendars.get(item["id"])
+                if events is None:
+                    calendars[item["id"]] = {"errors": [{"reason": "notFound"}]}
+                    continue
+                calendars[item["id"]] = {"busy": [
+                    {"start": e["start"]["dateTime"], "end": e["end"]["dateTime"]}
+                    for e in events.values()
+                    if e["status"] != "cancelled" and "dateTime" in e["start"]
+                    and _overlaps(e, time_min, time_max)
+                ]}
+        return 200, {"calendars": calendars}
+
+
+def _overlaps(event: dict, time_min, time_max) -> bool:
+    start, end = event["start"], event["end"]
+    if "dateTime" not in start:
+        # Good enough for tests: all-day events match any window.
+        return True
+    return (time_max is None or parse_rfc3339(start["dateTime"]) < time_max) and (
+        time_min is None or parse_rfc3339(end["dateTime"]) > time_min
+    )
+
+
+def _dispatch(calendar: FakeCalendar, method: str, path: str, query: Dict[str, str], body: Optional[dict]):
+    calendar.requests.append({"method": method, "path": path, "query": query, "body": body})
+
+    segments = [unquote(s) for s in path.strip("/").split("/")]
+    if method == "GET" and segments == ["users", "me", "calendarList", "primary"]:
+        return 200, {"id": "primary", "timeZone": calendar.time_zone}
+    if method == "GET" and segments == ["users", "me", "calendarList"]:
+        items = [{"id": cid, "primary": cid == "primary", "selected": True} for cid in calendar.calendars]
+        return 200, {"items": items}
+    if method == "POST" and segments == ["freeBusy"]:
+        return calendar.free_busy(body)
+    if len(segments) == 3 and segments[0] == "calendars" and segments[2] == "events":
+        if method == "GET":
+            return calendar.list_events(segments[1], query)
+        if method == "POST":
+            return 200, calendar._store(segments[1], {"status": "confirmed", **body})
+    return 404, {"error": {"code": 404, "message": f"No route for {method} {path}"}}
+
+
+def _batch(calendar: FakeCalendar, content_type: str, payload: str):
+    """Answer a multipart/mixed batch: one embedded HTTP response per part."""
+    boundary = content_type.split("boundary=", 1)[1].strip('"')
+    reply_boundary = "batch_reply"
+    parts = []
+
+    for part in payload.split(f"--{boundary}"):
+        part = part.strip("\r\n")
+        if not part or part == "--":
+            continue
+        outer, _, http_message = part.partition("\r\n\r\n")
+        content_id = next(
+            line.split(":", 1)[1].strip().strip("<>")
+            for line in outer.split("\r\n") if line.lower().startswith("content-id")
+        )
+        head, _, body = http_message.partition("\r\n\r\n")
+        method, target, _ = head.split("\r\n", 1)[0].split(" ")
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = json.loads(body) if body.strip() else None
+
+        if calendar.throttled_parts:
+            calendar.throttled_parts -= 1
+            status, reply = 429, {"error": {"code": 429, "errors": [{"reason": "rateLimitExceeded"}]}}
+        else:
+            status, reply = _dispatch(calendar, method, url.path[len(API_PREFIX):], query, body)
+
+        parts.append("\r\n".join([
+            f"--{reply_boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <response-{content_id}>",
+            "",
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+            "Content-Type: application/json",
+            "",
+            json.dumps(reply),
+        ]))
+
+    text = "\r\n".join(parts) + f"\r\n--{reply_boundary}--\r\n"
+    return f"multipart/mixed; boundary={reply_boundary}", text
+
+
+def _handler(calendar: FakeCalendar):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: Optional[dict]):
+            self._send(status, "application/json", json.dumps(body))
+
+        def _send(self, status: int, content_type: str, text: str):
+            payload = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _route(self, method: str):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length).decode() if length else ""
+
+            if method == "POST" and parts.path == "/batch" + API_PREFIX:
+                calendar.batches += 1
+                return self._send(200, *_batch(calendar, self.headers["Content-Type"], raw))
+
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            body = json.loads(raw) if raw else None
+            self._reply(*_dispatch(calendar, method, parts.path[len(API_PREFIX):], query, body))
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+    return Handler
+
+
+class FakeCalendarServer:
+    def __init__(self, calendar: Optional[FakeCalendar] = None):
+        self.calendar = calendar or FakeCalendar()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self.calendar))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def __enter__(self) -> "FakeCalendarServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,102 @@
+import pytest
+
+from app.calendar_client import BATCH_LIMIT, BatchRequest, GoogleCalendarClient, _parse_batch_response
+
+
+def _event(summary, hour):
+    return {
+        "summary": summary,
+        "start": {"dateTime": f"2024-03-04T{hour:02d}:00:00Z"},
+        "end": {"dateTime": f"2024-03-04T{hour:02d}:30:00Z"},
+    }
+
+
+def test_create_events_sends_one_part_per_event_in_order(calendar_client, calendar_server):
+    calendar = calendar_server.calendar
+
+    responses = calendar_client.create_events("token", "primary", [_event(f"task {i}", 9 + i) for i in range(3)])
+
+    assert calendar.batches == 1
+    assert [r.status for r in responses] == [200, 200, 200]
+    assert [r.body["summary"] for r in responses] == ["task 0", "task 1", "task 2"]
+    assert [e["summary"] for e in calendar.calendars["primary"].values()] == ["task 0", "task 1", "task 2"]
+
+
+def test_batch_parts_carry_quoted_paths_and_query_strings(calendar_client, calendar_server):
+    calendar = calendar_server.calendar
+    calendar.add_event("team#1@group.calendar.google.com", "2024-03-04T09:00:00Z", "2024-03-04T10:00:00Z", "sync")
+    params = {"timeMin": "2024-03-04T00:00:00Z", "timeMax": "2024-03-05T00:00:00Z", "singleEvents": True}
+
+    [response] = calendar_client.list_events_many("token", "team#1@group.calendar.google.com", [params])
+
+    assert response.ok
+    assert [e["summary"] for e in response.body["items"]] == ["sync"]
+    [sent] = calendar.requests
+    assert sent["path"] == "/calendars/team%231@group.calendar.google.com/events"
+    assert sent["query"]["singleEvents"] == "true"
+
+
+def test_failed_parts_are_reported_not_raised(calendar_client):
+    responses = calendar_client.batch("token", [
+        BatchRequest("GET", "/users/me/calendarList/primary"),
+        BatchRequest("GET", "/nowhere"),
+    ])
+
+    assert responses[0].ok and responses[0].body["timeZone"] == "UTC"
+    assert not responses[1].ok
+    assert responses[1].status == 404
+    assert responses[1].error == "No route for GET /nowhere"
+
+
+def test_requests_past_the_batch_limit_are_split(calendar_client, calendar_server):
+    count = BATCH_LIMIT + 2
+
+    responses = calendar_client.create_events("token", "primary", [_event(f"task {i}", 9) for i in range(count)])
+
+    assert calendar_server.calendar.batches == 2
+    assert [r.body["summary"] for r in responses] == [f"task {i}" for i in range(count)]
+
+
+def test_only_throttled_parts_are_resent(calendar_server):
+    client = GoogleCalendarClient(calendar_server.base_url, max_retries=2, backoff_base=0, backoff_max=0)
+    calendar = calendar_server.calendar
+    calendar.throttled_parts = 2
+
+    responses = client.create_events("token", "primary", [_event(f"task {i}", 9 + i) for i in range(4)])
+
+    assert calendar.batches == 2
+    assert all(r.ok for r in responses)
+    # The first two parts were rejected and resent; nothing was created twice.
+    assert [r.body["summary"] for r in responses] == ["task 0", "task 1", "task 2", "task 3"]
+    assert len(calendar.calendars["primary"]) == 4
+
+
+def test_parse_batch_response_matches_parts_by_content_id():
+    text = (
+        "--b\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-item-1>\r\n"
+        "\r\n"
+        "HTTP/1.1 403 Forbidden\r\n"
+        "Content-Type: application/json\r\n"
+        "\r\n"
+        '{"error": {"code": 403, "message": "Forbidden"}}\r\n'
+        "--b\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-item-0>\r\n"
+        "\r\n"
+        "HTTP/1.1 204 No Content\r\n"
+        "\r\n"
+        "\r\n"
+        "--b--\r\n"
+    )
+
+    parsed = _parse_batch_response('multipart/mixed; boundary="b"', text)
+
+    assert parsed[0].status == 204 and parsed[0].body is None
+    assert parsed[1].error == "Forbidden"
+
+
+def test_parse_batch_response_requires_a_boundary():
+    with pytest.raises(ValueError):
+        _parse_batch_response("multipart/mixed", "")
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.batch_plans import run
+from app.repositories import PlanRepository, TaskRepository
+from benchmarks.fakes import FakeCalendarClient
+
+
+def _tasks(sub):
+    return [
+        {"id": f"{sub}-{i}", "name": f"task {i}", "priority": "high", "time": 30, "concentration": "low",
+         "isCompleted": False, "isScheduled": False}
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def repos(db):
+    task_repo = TaskRepository(db.tasks)
+    for i in range(5):
+        sub = f"user{i}"
+        db.users.insert_one({"sub": sub, "accessToken": f"token{i}", "timeZone": "UTC"})
+        task_repo.upsert_task_cluster(sub, _tasks(sub))
+    # No access token: never planned.
+    db.users.insert_one({"sub": "signed-out"})
+    return task_repo, PlanRepository(db.plans)
+
+
+def _run(db, repos, chunk_size=2):
+    task_repo, plan_repo = repos
+    return run(
+        db.users, task_repo, plan_repo,
+        lambda: FakeCalendarClient({"primary": []}),
+        workers=0, chunk_size=chunk_size, days=2,
+    )
+
+
+def test_one_plan_per_user_and_throughput(db, repos):
+    stats = _run(db, repos)
+
+    assert (stats.users, stats.planned, stats.failed) == (5, 5, 0)
+    assert stats.seconds > 0 and stats.users_per_second > 0
+    assert sorted(p["sub"] for p in db.plans.find()) == [f"user{i}" for i in range(5)]
+    plan = repos[1].find_by_sub("user0")
+    assert sorted(t["id"] for t in plan["scheduled_tasks"]) == ["user0-0", "user0-1", "user0-2"]
+
+
+def test_a_failing_user_keeps_the_previous_plan(db, repos):
+    _run(db, repos)
+    previous = repos[1].find_by_sub("user3")
+
+    # An unknown timezone makes scheduling raise for this user only.
+    db.users.update_one({"sub": "user3"}, {"$set": {"timeZone": "Nowhere/Special"}})
+    stats = _run(db, repos)
+
+    assert (stats.users, stats.planned, stats.failed) == (5, 4, 1)
+    plan = repos[1].find_by_sub("user3")
+    assert plan["scheduled_tasks"] == previous["scheduled_tasks"]
+    assert plan["generatedAt"] == previous["generatedAt"]
+    assert "Nowhere/Special" in plan["lastError"]
+    assert plan["lastErrorAt"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc)
+    assert "lastError" not in repos[1].find_by_sub("user2")
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+from app.calendar_sync import CalendarSync
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@pytest.fixture
+def now():
+    return datetime.now(pytz.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def sync(calendar_client, db):
+    return CalendarSync(calendar_client, db.calendar_events, db.calendar_sync_state, days_ahead=3)
+
+
+def _mirrored(sync, now, days=30):
+    events = sync.events_between("sub", ["primary"], now - timedelta(days=2), now + timedelta(days=days))
+    return {e["summary"] for e in events}
+
+
+def test_full_listing_mirrors_the_window_and_stores_a_token(sync, calendar_server, now, db):
+    calendar = calendar_server.calendar
+    calendar.add_event("primary", _iso(now + timedelta(hours=1)), _iso(now + timedelta(hours=2)), "standup")
+    calendar.add_event("primary", _iso(now + timedelta(days=10)), _iso(now + timedelta(days=10, hours=1)), "far")
+
+    assert sync.sync("sub", "token") == 1
+
+    assert _mirrored(sync, now) == {"standup"}
+    state = db.calendar_sync_state.find_one({"sub": "sub", "calendarId": "primary"})
+    assert state["syncToken"]
+    assert state["windowEnd"] == pytest.approx((now + timedelta(days=3)).timestamp(), abs=5)
+
+
+def test_delta_sync_applies_only_changes(sync, calendar_server, now):
+    calendar = calendar_server.calendar
+    calendar.add_event("primary", _iso(now + timedelta(hours=1)), _iso(now + timedelta(hours=2)), "kept")
+    moved = calendar.add_event("primary", _iso(now + timedelta(hours=3)), _iso(now + timedelta(hours=4)), "moved")
+    gone = calendar.add_event("primary", _iso(now + timedelta(hours=5)), _iso(now + timedelta(hours=6)), "gone")
+    sync.sync("sub", "token")
+
+    calendar.update_event("primary", moved["id"], summary="moved later")
+    calendar.delete_event("primary", gone["id"])
+    calendar.add_event("primary", _iso(now + timedelta(hours=7)), _iso(now + timedelta(hours=8)), "new")
+
+    assert sync.sync("sub", "token", force=True) == 3
+
+    assert _mirrored(sync, now) == {"kept", "moved later", "new"}
+    last = calendar.requests[-1]
+    assert "syncToken" in last["query"] and "timeMin" not in last["query"]
+
+
+def test_recent_sync_is_skipped(sync, calendar_server):
+    sync.sync("sub", "token")
+    requests_before = len(calendar_server.calendar.requests)
+
+    assert sync.sync("sub", "token") == 0
+    assert len(calendar_server.calendar.requests) == requests_before
+
+
+def test_expired_token_triggers_a_full_resync(sync, calendar_server, now):
+    calendar = calendar_server.calendar
+    calendar.add_event("primary", _iso(now + timedelta(hours=1)), _iso(now + timedelta(hours=2)), "stays")
+    dropped = calendar.add_event("primary", _iso(now + timedelta(hours=3)), _iso(now + timedelta(hours=4)), "dropped")
+    sync.sync("sub", "token")
+
+    # A change the token would never report, then the token goes stale.
+    calendar.delete_event("primary", dropped["id"], silently=True)
+    calendar.expire_sync_tokens()
+
+    sync.sync("sub", "token", force=True)
+
+    assert _mirrored(sync, now) == {"stays"}
+    incremental = [r["query"].get("syncToken") is not None for r in calendar.requests if r["path"].endswith("/events")]
+    assert incremental == [False, True, False]
+
+
+def test_horizon_past_the_listed_window_forces_a_full_listing(sync, calendar_server, now):
+    calendar = calendar_server.calendar
+    calendar.add_event("primary", _iso(now + timedelta(days=6)), _iso(now + timedelta(days=6, hours=1)), "recurring")
+    sync.sync("sub", "token")
+    assert _mirrored(sync, now) == set()
+
+    # The event never changes, so only a wider full listing can find it,
+    # even straight after the last sync.
+    sync.sync("sub", "token", until=now + timedelta(days=7))
+
+    assert _mirrored(sync, now) == {"recurring"}
+    assert "timeMax" in calendar.requests[-1]["query"]
+
+
+def test_calendar_ids_with_reserved_characters(calendar_client, calendar_server, db, now):
+    holidays = "en.usa#holiday@group.v.calendar.google.com"
+    calendar_server.calendar.calendars[holidays] = {}
+    calendar_server.calendar.add_event(holidays, _iso(now + timedelta(hours=1)), _iso(now + timedelta(hours=2)), "holiday")
+    sync = CalendarSync(calendar_client, db.calendar_events, db.calendar_sync_state)
+
+    assert sync.sync("sub", "token", holidays) == 1
+    assert [e["summary"] for e in sync.events_between("sub", [holidays], now, now + timedelta(days=1))] == ["holiday"]
@@ -0,0 +1,93 @@
+import pytest
+
+from app.event_cache import EventCache, InMemoryCacheBackend, build_event_cache
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"items": [self.calls]}
+
+
+@pytest.fixture
+def cache():
+    return EventCache(InMemoryCacheBackend(), ttl_seconds=60)
+
+
+def test_reads_are_cached_per_user_and_query(cache):
+    load = CountingLoader()
+
+    assert cache.get_or_load("token-a", "events", "primary", {"day": 1}, load) == {"items": [1]}
+    assert cache.get_or_load("token-a", "events", "primary", {"day": 1}, load) == {"items": [1]}
+    assert load.calls == 1
+
+    cache.get_or_load("token-a", "events", "primary", {"day": 2}, load)
+    cache.get_or_load("token-a", "events", "work", {"day": 1}, load)
+    cache.get_or_load("token-b", "events", "primary", {"day": 1}, load)
+    assert load.calls == 4
+
+
+def test_invalidate_drops_every_window_of_that_user_only(cache):
+    load = CountingLoader()
+    for token in ("token-a", "token-b"):
+        for day in (1, 2):
+            cache.get_or_load(token, "events", "primary", {"day": day}, load)
+    assert load.calls == 4
+
+    cache.invalidate("token-a")
+
+    for token in ("token-a", "token-b"):
+        for day in (1, 2):
+            cache.get_or_load(token, "events", "primary", {"day": day}, load)
+    assert load.calls == 6
+
+
+def test_a_lost_generation_never_resurrects_old_entries(cache):
+    load = CountingLoader()
+    cache.get_or_load("token-a", "events", "primary", {}, load)
+    cache.invalidate("token-a")
+    cache.get_or_load("token-a", "events", "primary", {}, load)
+
+    # Losing the generation key draws a fresh one rather than restarting a
+    # counter that could land on a generation with entries still cached.
+    cache.backend._pinned.clear()
+
+    assert cache.get_or_load("token-a", "events", "primary", {}, load) == {"items": [3]}
+
+
+def test_generations_survive_lru_eviction():
+    cache = EventCache(InMemoryCacheBackend(max_entries=3), ttl_seconds=60)
+    load = CountingLoader()
+    cache.get_or_load("token-a", "events", "primary", {"day": 0}, load)
+    cache.invalidate("token-a")
+    generation = cache.backend.get(cache._generation_key(cache.user_key("token-a")))
+
+    for day in range(10):
+        cache.get_or_load("token-b", "events", "primary", {"day": day}, load)
+
+    assert cache.backend.get(cache._generation_key(cache.user_key("token-a"))) == generation
+    assert len(cache.backend._data) == 3
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.event_cache.time.monotonic", lambda: clock[0])
+    cache = EventCache(InMemoryCacheBackend(), ttl_seconds=60)
+    load = CountingLoader()
+
+    cache.get_or_load("token-a", "events", "primary", {}, load)
+    clock[0] += 59
+    cache.get_or_load("token-a", "events", "primary", {}, load)
+    assert load.calls == 1
+
+    clock[0] += 2
+    cache.get_or_load("token-a", "events", "primary", {}, load)
+    assert load.calls == 2
+
+
+def test_no_process_local_cache_for_several_workers():
+    assert build_event_cache(None, 60, processes=4) is None
+    assert isinstance(build_event_cache(None, 60).backend, InMemoryCacheBackend)
@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytz
+
+from app.freebusy import event_interval, free_intervals, local_midnight, merge_intervals
+
+TZ = pytz.timezone("Europe/Berlin")
+ORIGIN = local_midnight(date(2024, 3, 4), TZ)
+
+
+def test_merge_coalesces_overlapping_and_touching_intervals():
+    assert merge_intervals([(50, 60), (0, 10), (10, 20), (15, 30), (40, 45)]) == [(0, 30), (40, 45), (50, 60)]
+
+
+def test_merge_skips_empty_intervals_and_keeps_contained_ones_inside():
+    assert merge_intervals([(5, 5), (0, 100), (20, 30), (90, 90)]) == [(0, 100)]
+    assert merge_intervals([]) == []
+
+
+def test_free_intervals_clip_busy_time_to_each_window():
+    windows = [(540, 720), (780, 1020)]
+    # Spills into the first window, covers the gap, and splits the second.
+    busy = [(500, 560), (700, 800), (900, 930)]
+    assert free_intervals(windows, busy) == [(560, 700), (800, 900), (930, 1020)]
+
+
+def test_free_intervals_drop_fully_covered_windows():
+    windows = [(0, 60), (120, 180), (240, 300)]
+    busy = [(110, 190), (250, 260), (255, 290)]
+    assert free_intervals(windows, busy) == [(0, 60), (240, 250), (290, 300)]
+
+
+def test_free_intervals_without_busy_time_return_the_windows():
+    assert free_intervals([(0, 60), (120, 180)], []) == [(0, 60), (120, 180)]
+
+
+def test_event_interval_adds_the_buffer_to_timed_events():
+    event = {"start": {"dateTime": "2024-03-04T09:00:00+01:00"}, "end": {"dateTime": "2024-03-04T09:30:00Z"}}
+    assert event_interval(event, ORIGIN, TZ, buffer_minutes=10) == (540, 640)
+
+
+def test_event_interval_blocks_whole_local_days_for_all_day_events():
+    event = {"start": {"date": "2024-03-05"}, "end": {"date": "2024-03-06"}}
+    assert event_interval(event, ORIGIN, TZ, buffer_minutes=10) == (1440, 2880)
+
+
+def test_event_interval_ignores_events_that_do_not_block_time():
+    timed = {"start": {"dateTime": "2024-03-04T09:00:00+01:00"}, "end": {"dateTime": "2024-03-04T10:00:00+01:00"}}
+
+    assert event_interval({**timed, "status": "cancelled"}, ORIGIN, TZ) is None
+    assert event_interval({**timed, "transparency": "transparent"}, ORIGIN, TZ) is None
+    declined = [{"self": True, "responseStatus": "declined"}, {"email": "x@example.com", "responseStatus": "accepted"}]
+    assert event_interval({**timed, "attendees": declined}, ORIGIN, TZ) is None
+    accepted = [{"self": True, "responseStatus": "accepted"}, {"email": "x@example.com", "responseStatus": "declined"}]
+    assert event_interval({**timed, "attendees": accepted}, ORIGIN, TZ) == (540, 600)
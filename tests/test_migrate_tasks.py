@@ -0,0 +1,20 @@
+import logging
+
+from app.migrate_tasks import migrate
+from app.repositories import LAYOUT_PER_TASK, TaskRepository
+
+
+def test_migrate_copies_every_user_and_logs_instead_of_printing(db, capsys, caplog):
+    embedded = TaskRepository(db.tasks)
+    for i in range(5):
+        embedded.upsert_task_cluster(f"user{i}", [{"id": j, "name": f"task {j}", "isScheduled": False} for j in range(2)])
+
+    with caplog.at_level(logging.INFO, logger="app.migrate_tasks"):
+        assert migrate(db.tasks, db.task_items, batch_size=2) == 5
+
+    assert capsys.readouterr().out == ""
+    assert [r.getMessage() for r in caplog.records] == [
+        "Copied tasks for 2 users", "Copied tasks for 4 users", "Copied tasks for 5 users",
+    ]
+    per_task = TaskRepository(db.tasks, db.task_items, layout=LAYOUT_PER_TASK)
+    assert [t["id"] for t in per_task.find_page("user3", 10)[0]] == [0, 1]
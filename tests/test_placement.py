@@ -0,0 +1,147 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytz
+
+from app.freebusy import free_intervals, local_midnight
+from app.minute_grid import MinuteGrid
+from app.models import Task
+from app.scheduler import ENGINE_NUMPY, ENGINE_SLOTS, Scheduler
+from app.slot_index import SlotIndex
+
+TIMEZONE = "America/New_York"
+TZ = pytz.timezone(TIMEZONE)
+ORIGIN = local_midnight(date(2024, 3, 4), TZ)
+BUFFER = 10
+
+
+def _slots(busy, days=3):
+    """Slots for 09:00-17:00 working days with 09:00-12:00 concentration time."""
+    windows = [(day * 1440 + 540, day * 1440 + 1020) for day in range(days)]
+    concentration = [(day * 1440 + 540, day * 1440 + 720) for day in range(days)]
+    scheduler = Scheduler(None, None, buffer_minutes=BUFFER)
+    return scheduler._calculate_slot_status(free_intervals(windows, busy), ORIGIN, concentration, TIMEZONE)
+
+
+def _tasks(seed, count, durations):
+    rng = random.Random(seed)
+    return [
+        Task(
+            id=i,
+            name=f"task {i}",
+            priority=rng.choice(["high", "medium", "low"]),
+            time_minutes=rng.choice(durations),
+            concentration=rng.choice(["high", "medium", "low"]),
+        )
+        for i in range(count)
+    ]
+
+
+def _busy(seed, count):
+    rng = random.Random(seed)
+    busy = []
+    for _ in range(count):
+        start = rng.randrange(3) * 1440 + rng.randrange(480, 1020, 30)
+        busy.append((start, start + rng.choice([30, 60, 90])))
+    return busy
+
+
+def _place(engine, tasks, slots):
+    scheduler = Scheduler(None, None, buffer_minutes=BUFFER, engine=engine)
+    return scheduler.schedule_tasks_in_slots(scheduler.sort_tasks(tasks), slots)
+
+
+def _parse(value):
+    return TZ.localize(datetime.strptime(value, "%Y-%m-%d %H:%M:%S"))
+
+
+def _assert_valid(placed, slots, tasks):
+    durations = {t.id: t.time_minutes for t in tasks}
+    spans = sorted((_parse(p["start_time"]), _parse(p["end_time"]), p["id"]) for p in placed)
+
+    for start, end, task_id in spans:
+        assert end - start == timedelta(minutes=durations[task_id])
+        # The task and its buffer lie inside one contiguous stretch of free slots.
+        covered = start
+        for slot in slots:
+            if slot["start"] <= covered < slot["end"]:
+                covered = slot["end"]
+        assert covered >= end + timedelta(minutes=BUFFER)
+
+    for (_, end, _), (next_start, _, _) in zip(spans, spans[1:]):
+        assert end + timedelta(minutes=BUFFER) <= next_start
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_place_slot_aligned_tasks_identically(seed):
+    # With every task plus buffer a whole number of slots, the minute grid
+    # has no in-between starts to use, so both engines must agree exactly.
+    tasks = _tasks(seed, 30, durations=[20, 50, 80, 110])
+    busy = _busy(seed, 8)
+
+    by_slots = _place(ENGINE_SLOTS, tasks, _slots(busy))
+    by_grid = _place(ENGINE_NUMPY, tasks, _slots(busy))
+
+    assert by_slots == by_grid
+    assert by_slots
+
+
+@pytest.mark.parametrize("engine", [ENGINE_SLOTS, ENGINE_NUMPY])
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_keep_tasks_in_free_time_without_overlap(engine, seed):
+    tasks = _tasks(seed, 40, durations=[5, 15, 25, 45, 60, 95])
+    slots = _slots(_busy(seed, 10))
+
+    placed = _place(engine, tasks, [dict(s) for s in slots])
+
+    _assert_valid(placed, slots, tasks)
+
+
+def test_concentration_tasks_start_in_concentration_time():
+    slots = _slots([])
+    tasks = [
+        Task(id="deep", name="deep", priority="high", time_minutes=50, concentration="high"),
+        Task(id="admin", name="admin", priority="high", time_minutes=20, concentration="low"),
+    ]
+
+    for engine in (ENGINE_SLOTS, ENGINE_NUMPY):
+        placed = {p["id"]: _parse(p["start_time"]) for p in _place(engine, tasks, [dict(s) for s in slots])}
+        assert placed["deep"].hour == 9
+        assert placed["admin"].hour == 12
+
+
+def test_slot_index_tracks_free_positions_per_concentration_class():
+    slots = _slots([(600, 660)], days=1)
+    index = SlotIndex(slots)
+
+    # 09:00 and 09:30 are concentration slots, 10:00-11:00 is busy.
+    assert index.next_free(0, True) == 0
+    assert index.next_free(2, True) == 2
+    assert slots[2]["start"].hour == 11
+    assert index.next_free(0, False) == 4
+    assert slots[4]["start"].hour == 12
+    assert not index.fits(0, 90)
+    assert index.fits(0, 60)
+
+    index.mark_used(slots[0]["start"], slots[0]["start"] + timedelta(minutes=40))
+
+    assert not slots[0]["available"] and not slots[1]["available"]
+    assert index.next_free(0, True) == 2
+    assert index.next_free(0, None) == 2
+    assert index.free_minutes_from(0) == 0
+
+
+def test_minute_grid_first_fit_respects_used_minutes_and_flags():
+    slots = _slots([(600, 660)], days=1)
+    grid = MinuteGrid(slots)
+
+    assert grid.first_fit(60) == 0
+    assert grid.first_fit(90) == 120
+    assert grid.to_datetime(120) == slots[2]["start"]
+
+    grid.mark_used(0, 25)
+
+    assert grid.first_fit(30) == 25
+    assert grid.first_fit(30, concentration_time=False) == 180
+    assert grid.first_fit(1000) is None
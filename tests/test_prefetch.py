@@ -0,0 +1,44 @@
+import pytest
+
+from app.jobs import JobError
+from app.prefetch import prefetch_scheduling_inputs
+from app.scheduler import Scheduler
+from benchmarks.fakes import FakeCalendarClient, FakeUserRepository
+
+USER = {"sub": "sub", "accessToken": "token", "timeZone": "Europe/Berlin"}
+
+
+class FakeTimezoneCache:
+    def get(self, user):
+        return user.get("timeZone")
+
+
+class FailingTaskRepository:
+    def find_schedulable(self, sub, limit):
+        raise RuntimeError("connection reset")
+
+
+class TaskRepository:
+    def find_schedulable(self, sub, limit):
+        return [{"id": 1, "name": "write report", "time": 30}]
+
+
+@pytest.fixture
+def scheduler():
+    return Scheduler(FakeCalendarClient({"primary": []}), FakeUserRepository([USER]))
+
+
+def test_inputs_are_loaded_together(scheduler):
+    inputs = prefetch_scheduling_inputs(USER, scheduler, TaskRepository(), FakeTimezoneCache(), 1, 10)
+
+    assert [t.name for t in inputs.tasks] == ["write report"]
+    assert inputs.timezone == "Europe/Berlin"
+    assert inputs.busy == []
+
+
+def test_a_failed_task_read_is_a_job_error(scheduler):
+    with pytest.raises(JobError) as raised:
+        prefetch_scheduling_inputs(USER, scheduler, FailingTaskRepository(), FakeTimezoneCache(), 1, 10)
+
+    assert raised.value.status == 500
+    assert raised.value.message == "Failed to load tasks"
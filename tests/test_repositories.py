@@ -0,0 +1,162 @@
+import pytest
+from flask import Flask
+
+from app import tasks_routes
+from app.repositories import LAYOUT_EMBEDDED, LAYOUT_PER_TASK, TaskRepository
+
+PRIORITIES = ["low", "high", "medium", None, "high", "low", "medium"]
+
+
+def _tasks():
+    # isScheduled is spelled out: mongomock's $filter treats a missing field
+    # as equal to True, which real Mongo does not.
+    return [
+        {"id": i, "name": f"task {i}", "priority": PRIORITIES[i], "time": 30,
+         "isCompleted": i in (1, 5), "isScheduled": False}
+        for i in range(len(PRIORITIES))
+    ]
+
+
+@pytest.fixture(params=[LAYOUT_EMBEDDED, LAYOUT_PER_TASK])
+def repo(request, db):
+    repo = TaskRepository(db.tasks, db.task_items, layout=request.param)
+    repo.upsert_task_cluster("sub", _tasks())
+    return repo
+
+
+def _pages(repo, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        tasks, cursor = repo.find_page("sub", limit, cursor, **filters)
+        pages.append([t["id"] for t in tasks])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_task_once_in_stored_order(repo):
+    assert _pages(repo, 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert _pages(repo, 7) == [[0, 1, 2, 3, 4, 5, 6]]
+
+
+def test_pages_apply_filters_before_the_limit(repo):
+    assert _pages(repo, 2, completed=False) == [[0, 2], [3, 4], [6]]
+    assert _pages(repo, 5, completed=True) == [[1, 5]]
+
+
+def test_pages_project_requested_fields(repo):
+    tasks, _ = repo.find_page("sub", 2, fields=["id", "name"])
+    assert tasks == [{"id": 0, "name": "task 0"}, {"id": 1, "name": "task 1"}]
+
+
+def test_cursors_are_layout_specific(repo, db):
+    _, cursor = repo.find_page("sub", 2)
+    other = LAYOUT_PER_TASK if repo.layout == LAYOUT_EMBEDDED else LAYOUT_EMBEDDED
+
+    with pytest.raises(ValueError):
+        TaskRepository(db.tasks, db.task_items, layout=other).find_page("sub", 2, cursor)
+    with pytest.raises(ValueError):
+        repo.find_page("sub", 2, "not-a-cursor")
+
+
+def test_schedulable_tasks_rank_by_priority_then_stored_order(repo):
+    assert [t["id"] for t in repo.find_schedulable("sub", 4)] == [4, 2, 3, 6]
+
+
+def test_open_task_ids_ignore_rank_and_skip_closed_or_missing_tasks(repo):
+    repo.mark_tasks_scheduled("sub", [(6, "2024-03-04 09:00:00", "2024-03-04 09:30:00")])
+
+    assert repo.find_open_task_ids("sub", [0, 1, 3, 6, 99]) == {"0", "3"}
+    assert repo.find_open_task_ids("sub", []) == set()
+    assert repo.find_open_task_ids("nobody", [0]) == set()
+
+
+def test_every_write_bumps_the_version(repo):
+    version = repo.get_version("sub")
+    assert version >= 1
+    assert repo.get_version("nobody") is None
+
+    repo.add_single_task("sub", {"id": 7, "name": "task 7", "isScheduled": False})
+    assert repo.get_version("sub") == version + 1
+
+    repo.update_task_completion("sub", 7, True)
+    assert repo.get_version("sub") == version + 2
+
+    repo.mark_tasks_scheduled("sub", [(0, "2024-03-04 09:00:00", "2024-03-04 09:30:00")])
+    assert repo.get_version("sub") == version + 3
+    assert [t["id"] for t in repo.find_page("sub", 10, scheduled=True)[0]] == [0]
+
+
+def test_unchanged_completion_keeps_the_version(repo):
+    version = repo.get_version("sub")
+
+    result = repo.update_task_completion("sub", 1, True)
+
+    assert (result.matched_count, result.modified_count) == (1, 0)
+    assert repo.get_version("sub") == version
+    assert repo.update_task_completion("sub", 99, True).matched_count == 0
+
+
+def test_dual_write_keeps_per_task_documents_current(db):
+    embedded = TaskRepository(db.tasks, db.task_items, layout=LAYOUT_EMBEDDED, dual_write=True)
+    embedded.upsert_task_cluster("sub", _tasks())
+    embedded.update_task_completion("sub", 0, True)
+    embedded.mark_tasks_scheduled("sub", [(2, "2024-03-04 09:00:00", "2024-03-04 09:30:00")])
+
+    per_task = TaskRepository(db.tasks, db.task_items, layout=LAYOUT_PER_TASK)
+    fields = ["id", "isCompleted", "isScheduled", "start_time"]
+
+    assert per_task.find_page("sub", 10, fields=fields)[0] == embedded.find_page("sub", 10, fields=fields)[0]
+    assert per_task.find_page("sub", 10, completed=True)[0][0]["id"] == 0
+
+
+@pytest.fixture
+def client(repo, monkeypatch):
+    monkeypatch.setattr(tasks_routes, "task_repo", repo)
+    app = Flask(__name__)
+    app.register_blueprint(tasks_routes.tasks_bp)
+    return app.test_client()
+
+
+def test_get_tasks_answers_304_until_the_tasks_change(client, repo):
+    first = client.get("/get-tasks?sub=sub&limit=2")
+    assert first.status_code == 200
+    assert [t["id"] for t in first.json["tasks"]] == [0, 1]
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/get-tasks?sub=sub&limit=2", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+
+    other_query = client.get("/get-tasks?sub=sub&limit=3", headers={"If-None-Match": etag})
+    assert other_query.status_code == 200
+
+    repo.update_task_completion("sub", 0, True)
+    changed = client.get("/get-tasks?sub=sub&limit=2", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_get_tasks_follows_next_cursor(client):
+    page = client.get("/get-tasks?sub=sub&limit=4&fields=name").json
+
+    assert page["tasks"][0] == {"id": 0, "name": "task 0"}
+    rest = client.get(f"/get-tasks?sub=sub&limit=4&after={page['next_cursor']}").json
+    assert [t["id"] for t in rest["tasks"]] == [4, 5, 6]
+    assert rest["next_cursor"] is None
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "limit=0", "after=bogus", "completed=maybe"])
+def test_get_tasks_rejects_malformed_queries(client, query):
+    assert client.get(f"/get-tasks?sub=sub&{query}").status_code == 400
+
+
+def test_update_completion_answers_the_same_for_both_layouts(client):
+    def update(task_id, is_completed):
+        return client.post("/update-completion", json={"sub": "sub", "id": task_id, "isCompleted": is_completed})
+
+    etag = client.get("/get-tasks?sub=sub").headers["ETag"]
+
+    assert update(1, True).status_code == 200
+    assert client.get("/get-tasks?sub=sub", headers={"If-None-Match": etag}).status_code == 304
+    assert update(0, True).status_code == 200
+    assert client.get("/get-tasks?sub=sub", headers={"If-None-Match": etag}).status_code == 200
+    assert update(99, True).status_code == 404
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import schedule_service
+from app.event_cache import InMemoryCacheBackend
+from app.plan_cache import PlanCache
+from app.repositories import PlanPreviewRepository, TaskRepository, UserRepository
+
+
+def _task(task_id, priority):
+    return {"id": task_id, "name": f"task {task_id}", "priority": priority, "time": 30,
+            "isCompleted": False, "isScheduled": False}
+
+
+def _planned(task_id, hour):
+    return {"task": f"task {task_id}", "id": task_id,
+            "start_time": f"2030-01-07 {hour:02d}:00:00", "end_time": f"2030-01-07 {hour:02d}:30:00"}
+
+
+@pytest.fixture
+def service(db, calendar_client, monkeypatch):
+    db.users.insert_one({"sub": "sub", "accessToken": "token", "timeZone": "UTC"})
+    task_repo = TaskRepository(db.tasks)
+    task_repo.upsert_task_cluster("sub", [_task(f"low-{i}", "low") for i in range(3)])
+
+    monkeypatch.setattr(schedule_service, "user_repo", UserRepository(db.users))
+    monkeypatch.setattr(schedule_service, "task_repo", task_repo)
+    monkeypatch.setattr(schedule_service, "plan_cache", PlanCache(InMemoryCacheBackend()))
+    monkeypatch.setattr(schedule_service, "plan_preview_repo", PlanPreviewRepository(db.plan_previews))
+    monkeypatch.setattr(schedule_service, "calendar_client", calendar_client)
+    monkeypatch.setattr(schedule_service, "calendar_sync", None)
+    return schedule_service
+
+
+def test_confirm_keeps_open_tasks_outside_the_top_k_and_reports_dropped_ones(service, calendar_server):
+    plan = {
+        "planId": "plan-1", "sub": "sub", "timeZone": "UTC", "days": 1,
+        "scheduled_tasks": [_planned("low-0", 9), _planned("low-1", 10), _planned("low-2", 11)],
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+    service.plan_cache.put("sub", plan)
+
+    # Enough higher-priority tasks arrive to push the planned ones out of
+    # the top SCHEDULE_TASK_LIMIT, and one planned task gets completed.
+    service.task_repo.upsert_task_cluster(
+        "sub", [_task(f"high-{i}", "high") for i in range(service.SCHEDULE_TASK_LIMIT + 1)]
+    )
+    service.task_repo.update_task_completion("sub", "low-1", True)
+
+    result = service.confirm_plan_for_user(sub="sub", plan_id="plan-1")
+
+    assert result["scheduled_tasks"] == ["task low-0", "task low-2"]
+    assert result["dropped_tasks"] == [{"task": "task low-1", "id": "low-1", "reason": "No longer open"}]
+    assert len(calendar_server.calendar.calendars["primary"]) == 2
+    assert service.task_repo.find_open_task_ids("sub", ["low-0", "low-1", "low-2"]) == set()